@@ -0,0 +1,187 @@
+import numpy as np
+from math import floor
+from membership import IndexedSet
+from sampling import sample_without_replacement
+
+COHORT_DURATION = 7.  # width of a birth cohort, in days
+N_PREM_AGEGROUPS = 16  # 5-year age groups of the Prem contact matrices, the last one being 75+
+
+
+def get_prem_age_limits(cat_index):
+    """
+    Age limits of the Prem age group "X_<cat_index + 1>", as used by get_agecategory(age, 'prem')
+    return: (age_min, age_max) in years. age_max is None for the last age group.
+    """
+    if cat_index == N_PREM_AGEGROUPS - 1:
+        return 5. * cat_index, None
+    return 5. * cat_index, 5. * (cat_index + 1)
+
+
+def get_subgroup_age_limits(subgroup):
+    """
+    Age limits of the subgroups used by Individual.is_in_subgroup ("children", "young_children" and "adult"), and of
+    the whole population ("all"). Dates of birth and times are whole days so that no individual is aged exactly 5 or
+    15 years and the limits can be used with either inclusion convention.
+    return: (age_min, age_max) in years. age_max is None when there is no upper limit.
+    """
+    return {'all': (0., None), 'children': (0., 15.), 'young_children': (0., 5.), 'adult': (15., None)}[subgroup]
+
+
+class CohortIndex(object):
+    """
+    Index of the living individuals by birth cohort (one cohort per week of birth). Since the cohort of an individual
+    never changes, insertions and deletions cost O(1) and the index never needs to be rebuilt. The individuals of any
+    age range correspond to a contiguous range of cohorts, the two boundary cohorts being filtered using the exact
+    dates of birth.
+    """
+    def __init__(self, population):
+        self.population = population  # population.Population object storing the dates of birth
+        self.first_cohort = 0  # cohort number of self.buckets[0]
+        self.buckets = []  # IndexedSet objects listing the members of each cohort, ordered by cohort number
+        self.counts = np.zeros(0, dtype=np.int64)  # nb of members of each cohort
+        self.version = 0  # incremented at each insertion or deletion
+        self.cached_frames = {}  # keyed by (age_min, age_max), valued with (time, version, frame). see get_frame
+
+    def get_cohort(self, dOB):
+        return int(floor(dOB / COHORT_DURATION))
+
+    def get_position(self, dOB):
+        """
+        Position in self.buckets of the cohort corresponding to dOB. The list of buckets is extended if needed.
+        """
+        cohort = self.get_cohort(dOB)
+        if len(self.buckets) == 0:
+            self.first_cohort = cohort
+        if cohort < self.first_cohort:
+            n_new = self.first_cohort - cohort
+            self.buckets = [IndexedSet() for _ in range(n_new)] + self.buckets
+            self.counts = np.concatenate((np.zeros(n_new, dtype=np.int64), self.counts))
+            self.first_cohort = cohort
+        position = cohort - self.first_cohort
+        if position >= len(self.buckets):
+            n_new = position - len(self.buckets) + 1
+            self.buckets += [IndexedSet() for _ in range(n_new)]
+            self.counts = np.concatenate((self.counts, np.zeros(n_new, dtype=np.int64)))
+        return position
+
+    def add(self, ind_id):
+        """
+        Record individual ind_id. Its date of birth must already be stored in the population columns.
+        """
+        position = self.get_position(self.population.dOB[ind_id])
+        self.buckets[position].add(ind_id)
+        self.counts[position] += 1
+        self.version += 1
+
+    def remove(self, ind_id):
+        position = self.get_position(self.population.dOB[ind_id])
+        self.buckets[position].remove(ind_id)
+        self.counts[position] -= 1
+        self.version += 1
+
+    def get_cohort_range(self, age_min, age_max, time):
+        """
+        Find the cohorts containing the individuals aged between age_min (included) and age_max (excluded) at "time".
+        age_max=None means no upper age limit.
+        return: (dOB_min, dOB_max, first_position, last_position). The individuals of the age range are those with
+            dOB_min < dOB <= dOB_max and they belong to the cohorts first_position to last_position (included).
+        """
+        dOB_max = time - 365.25 * age_min
+        dOB_min = -np.inf if age_max is None else time - 365.25 * age_max
+        last_position = min(self.get_cohort(dOB_max) - self.first_cohort, len(self.buckets) - 1)
+        if age_max is None:
+            first_position = 0
+        else:
+            first_position = max(self.get_cohort(dOB_min) - self.first_cohort, 0)
+        return dOB_min, dOB_max, first_position, last_position
+
+    def get_boundary_ids(self, position, dOB_min, dOB_max):
+        ind_ids = self.buckets[position].ids
+        dOBs = self.population.dOB[ind_ids]
+        return ind_ids[(dOBs > dOB_min) & (dOBs <= dOB_max)]
+
+    def get_ids(self, age_min, age_max, time):
+        """
+        return: an array with the ids of the individuals aged between age_min (included) and age_max (excluded)
+        """
+        dOB_min, dOB_max, first_position, last_position = self.get_cohort_range(age_min, age_max, time)
+        if first_position > last_position:
+            return np.zeros(0, dtype=np.int64)
+        if first_position == last_position:
+            return self.get_boundary_ids(first_position, dOB_min, dOB_max)
+        id_arrays = [self.get_boundary_ids(first_position, dOB_min, dOB_max)]
+        id_arrays += [self.buckets[position].ids for position in range(first_position + 1, last_position)
+                      if self.counts[position] > 0]
+        id_arrays.append(self.get_boundary_ids(last_position, dOB_min, dOB_max))
+        return np.concatenate(id_arrays)
+
+    def get_frame(self, age_min, age_max, time):
+        """
+        Describe the individuals aged between age_min (included) and age_max (excluded) without collecting their ids.
+        The frame is cached until the time or the index changes.
+        return: (first_ids, inner_position, cumulated_counts, last_ids) where first_ids and last_ids are the ids found
+            in the two boundary cohorts and cumulated_counts are the cumulated counts of the inner cohorts, the first of
+            which is found at inner_position in self.buckets
+        """
+        cached = self.cached_frames.get((age_min, age_max))
+        if cached is not None and cached[0] == time and cached[1] == self.version:
+            return cached[2]
+        dOB_min, dOB_max, first_position, last_position = self.get_cohort_range(age_min, age_max, time)
+        no_ids = np.zeros(0, dtype=np.int64)
+        if first_position > last_position:
+            frame = (no_ids, 0, no_ids, no_ids)
+        elif first_position == last_position:
+            frame = (self.get_boundary_ids(first_position, dOB_min, dOB_max), first_position + 1, no_ids, no_ids)
+        else:
+            frame = (self.get_boundary_ids(first_position, dOB_min, dOB_max), first_position + 1,
+                     np.cumsum(self.counts[first_position + 1:last_position]),
+                     self.get_boundary_ids(last_position, dOB_min, dOB_max))
+        self.cached_frames[(age_min, age_max)] = (time, self.version, frame)
+        return frame
+
+    def count(self, age_min, age_max, time):
+        """
+        return: the number of individuals aged between age_min (included) and age_max (excluded)
+        """
+        first_ids, inner_position, cumulated_counts, last_ids = self.get_frame(age_min, age_max, time)
+        n_inner = int(cumulated_counts[-1]) if len(cumulated_counts) > 0 else 0
+        return len(first_ids) + n_inner + len(last_ids)
+
+    def sample_ids(self, age_min, age_max, time, n, uniform_draws):
+        """
+        Draw n distinct individuals uniformly among those aged between age_min (included) and age_max (excluded),
+        without collecting the ids of the whole age range. Positions in the age range are drawn with Floyd's algorithm
+        and then located in the cohorts using the cumulated cohort counts, so that the cost does not depend on the
+        number of individuals.
+        uniform_draws: a sequence of n random numbers drawn uniformly in [0, 1)
+        return: an array of n ids, or None if the age range contains less than n individuals
+        """
+        first_ids, inner_position, cumulated_counts, last_ids = self.get_frame(age_min, age_max, time)
+        n_inner = int(cumulated_counts[-1]) if len(cumulated_counts) > 0 else 0
+        n_total = len(first_ids) + n_inner + len(last_ids)
+        if n > n_total:
+            return None
+
+        sampled_ids = np.zeros(n, dtype=np.int64)
+        for i, rank in enumerate(sample_without_replacement(n_total, n, uniform_draws)):
+            if rank < len(first_ids):
+                sampled_ids[i] = first_ids[rank]
+            elif rank < len(first_ids) + n_inner:
+                rank -= len(first_ids)
+                k = int(np.searchsorted(cumulated_counts, rank, side='right'))
+                offset = rank - (cumulated_counts[k - 1] if k > 0 else 0)
+                sampled_ids[i] = self.buckets[inner_position + k].members[offset]
+            else:
+                sampled_ids[i] = last_ids[rank - len(first_ids) - n_inner]
+        return sampled_ids
+
+    def sample_prem_agegroup_ids(self, cat_index, time, n, uniform_draws):
+        """
+        Draw n distinct individuals of the Prem age group "X_<cat_index + 1>" (see sample_ids). All the individuals of
+        the age group are returned when it contains n individuals or less.
+        """
+        age_min, age_max = get_prem_age_limits(cat_index)
+        sampled_ids = self.sample_ids(age_min, age_max, time, n, uniform_draws)
+        if sampled_ids is None:
+            return self.get_ids(age_min, age_max, time)
+        return sampled_ids
@@ -0,0 +1,11 @@
+import numpy as np
+
+
+def age_preference_function(age_difference, sigma):
+    """
+    Given the age difference between two individuals, computes the relative probability of contact.
+    Reference: no age difference.
+    sigma is the standard deviation of the Gaussian kernel, specific to the location type ("school" or "workplace")
+    """
+    relative_risk = np.exp(-age_difference ** 2 / (2 * sigma ** 2))
+    return relative_risk
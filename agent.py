@@ -1,5 +1,8 @@
-from numpy import random, nonzero, exp, linspace
+from numpy import random, exp, linspace, interp, where, clip, isnan, inf, arange, ones, rint, minimum, ceil
+from sys import getsizeof
 import tb_activation
+from population import STRAINS, ORGANS, STRAIN_CODES, ORGAN_CODES, ProgrammedView, DS, MDR, SMEARPOS, SMEARNEG,\
+    EXTRAPULMONARY
 
 
 def draw_life_duration_using_death_rates():
@@ -24,183 +27,225 @@ def draw_life_duration_using_death_rates():
         return life_duration
 
 
-class Individual:
+class SusceptibilityTable(object):
     """
-    This class defines the individuals
+    Relative susceptibility to infection, tabulated by (vaccinated, ltbi, age in days). Baseline is for a non-vaccinated
+    individual without LTBI. BCG efficacy is maximal until bcg_start_waning_year and then wanes linearly to zero at
+    bcg_end_waning_year. LTBI multiplies the susceptibility by latent_protection_multiplier.
+    Dates of birth and times are whole days so that the table is exact. Ages beyond the end of BCG waning are given the
+    value of the last entry of the table.
+    The table is built for the values of the parameters listed in PARAMS. is_valid_for tells whether these parameters
+    have changed since then.
     """
-    def __init__(self, id, household_id, dOB):
-        # individual non TB-specific characteristics
-        self.id = id  # integer
-        self.household_id = household_id     # integer
-        self.dOB = dOB   # integer corresponding to the date of birth
+    PARAMS = ['bcg_start_waning_year', 'bcg_end_waning_year', 'bcg_maximal_efficacy', 'latent_protection_multiplier']
 
-        # variables below are not used for the moment
-        self.diabetes = False   # boolean
-        self.hiv = False    # boolean
+    def __init__(self, params):
+        self.key = [params[name] for name in self.PARAMS]
+        n_days = int(ceil(params['bcg_end_waning_year'] * 365.25)) + 1
+        efficacy = interp(arange(n_days) / 365.25, [params['bcg_start_waning_year'], params['bcg_end_waning_year']],
+                          [params['bcg_maximal_efficacy'], 0.])
+        self.values = ones((2, 2, n_days))
+        self.values[1, :, :] = 1. - efficacy  # vaccinated individuals
+        self.values[:, 1, :] *= params['latent_protection_multiplier']  # latently infected individuals
 
-        # individual TB-specific characteristics
-        self.vaccinated = False
-        self.vaccine_immunity_duration = 15.  # in years
-        self.ltbi = False
-        self.tb_strain = None  # 'ds' or 'mdr'
-        self.active_tb = False
-        self.tb_organ = None
-        self.tb_detected = False
-        self.tb_treated = False
-        self.die_with_tb = False
-        self.contacts_while_tb = {'household': set([]), 'school': set([]), 'workplace': set([]), 'community': set([])}
+    def is_valid_for(self, params):
+        return self.key == [params[name] for name in self.PARAMS]
 
-        # individual group characteristics (school and work related)
-        self.group_ids = []  # list of ids of the groups to which the individual is currently belonging
-        self.is_ever_gonna_work = False
-
-        # programmed events
-        self.programmed = {'death': None, 'leave_home': None, 'go_to_school': None, 'leave_school': None,
-                           'leave_work': None}
+    def get_relative_susceptibility(self, individual, time):
+        age_in_days = min(int(round(time - individual.dOB)), self.values.shape[2] - 1)
+        return self.values[int(individual.vaccinated), int(individual.ltbi), age_in_days]
 
-    def set_dOB(self, age, current_time, time_step=None):
+    def get_relative_susceptibilities(self, population_data, ind_ids, time):
         """
-        Given a specific age (in years) at the time of initialisation, defines the date of birth of an individual.
-        The dOB attribute is therefore assigned with a negative integer, corresponding to the number of days elapsed
-        between the birth and the model initialisation.
+        Vectorised lookup for the individuals listed in the array ind_ids.
+        population_data is the population.Population object storing the individual characteristics.
         """
-        self.dOB = current_time - round(age*365.25)
-        if age == 0.:
-            self.dOB = current_time - round(random.uniform(low=0., high=time_step))
+        ages_in_days = minimum(rint(time - population_data.dOB[ind_ids]).astype(int), self.values.shape[2] - 1)
+        return self.values[population_data.vaccinated[ind_ids].astype(int), population_data.ltbi[ind_ids].astype(int),
+                           ages_in_days]
 
-    def set_death_date(self, life_duration):
-        """
-        Defines the death date. This concerns natural death so this date might change in case of active TB
-        """
-        proposed_dOD = self.dOB + round(life_duration*365.25)
-        if proposed_dOD > 0.:
-            self.programmed['death'] = proposed_dOD
-        else:
-            self.programmed['death'] = random.randint(0, 10.*365.25, 1)[0]
 
-    def set_date_leaving_home(self, params, minimum_date=None):
-        """
-        Define the date at which individuals will be leaving the household
-        :param minimum_date: if specified, lower bound for the leaving date
-        """
-        self.programmed['leave_home'] = round(self.dOB + 365.25 *\
-                                                   random.uniform(params['minimal_age_leave_hh'],
-                                                                  params['maximal_age_leave_hh']))
-        if minimum_date is not None:
-            self.programmed['leave_home'] = max(self.programmed['leave_home'], minimum_date)
+def get_relative_infectiousnesses(population_data, ind_ids, time, params):
+    """
+    Return the relative infectiousness of the TB cases listed in the array ind_ids. This quantity depends on the
+    following factors: age, smear status, detection status. Baseline is for an undetected Smear-positive TB case.
+    Extrapulmonary cases are not infectious.
+    population_data is the population.Population object storing the individual characteristics.
+    """
+    ages = population_data.get_ages_in_years(ind_ids, time)
+    if params['linear_scaleup_infectiousness']:
+        rr = clip(0.2 * ages - 2., 0., 1.)
+    else:
+        rr = 1. / (1. + exp(-(ages - params['infectiousness_switching_age'])))
+    organ_codes = population_data.tb_organ_code[ind_ids]
+    rr = where(organ_codes == SMEARNEG, rr * params['rel_infectiousness_smearneg'], rr)
+    rr[organ_codes == EXTRAPULMONARY] = 0.
+    detection_dates = population_data.programmed['detection'][ind_ids]
+    detected = where(isnan(detection_dates), inf, detection_dates) <= time
+    return where(detected, rr * params['rel_infectiousness_after_detect'], rr)
+
+
+def measure_memory_per_agent(n_individuals, household_size=4):
+    """
+    Build a synthetic population of n_individuals agents living in households of size household_size, with their
+    demographic events programmed, and measure its memory footprint. Python objects are measured with getsizeof.
+    Used to size cluster jobs.
+    return: a dictionary of numbers of bytes per agent, keyed by component
+    """
+    import household
+    import population
+    import scheduler
+    population_data = population.Population()
+    events = scheduler.EventScheduler(['death', 'leave_home', 'go_to_school', 'leave_school', 'leave_work'])
+    individuals = {}
+    households = {}
+    for i in range(n_individuals):
+        h_id = i // household_size
+        if h_id not in households:
+            households[h_id] = household.household(h_id)
+        ind_id = population_data.allocate()
+        individuals[ind_id] = Individual(id=ind_id, household_id=h_id, dOB=-round(random.uniform(0., 80.) * 365.25),
+                                         population=population_data)
+        households[h_id].individual_ids.append(ind_id)
+        households[h_id].size += 1
+        for event_type, date in zip(events.buckets.keys(), random.randint(0, 100 * 365, 5)):
+            individuals[ind_id].programmed[event_type] = date
+            individuals[ind_id].event_handles[event_type] = events.schedule(event_type, date, ind_id)
+
+    n_bytes = {'population_store': sum([getattr(population_data, name).nbytes for name, _, _ in population.COLUMNS]) +
+                                   sum([column.nbytes for column in population_data.programmed.values()]) +
+                                   population_data.alive.nbytes + population_data.generation.nbytes,
+               'individuals': getsizeof(individuals), 'households': getsizeof(households), 'scheduler': 0}
+    for ind in individuals.itervalues():
+        n_bytes['individuals'] += getsizeof(ind) + getsizeof(ind.group_ids) + getsizeof(ind.programmed) +\
+                                  getsizeof(ind.event_handles)
+        n_bytes['scheduler'] += sum([getsizeof(handle) for handle in ind.event_handles.values()])
+    for h in households.itervalues():
+        n_bytes['households'] += getsizeof(h) + getsizeof(h.individual_ids)
+    for event_type in events.buckets.keys():
+        n_bytes['scheduler'] += getsizeof(events.dates[event_type]) + getsizeof(events.buckets[event_type]) +\
+                                sum([getsizeof(bucket) for bucket in events.buckets[event_type].values()])
+    n_bytes['total'] = sum(n_bytes.values())
+    return {key: float(value) / n_individuals for key, value in n_bytes.iteritems()}
+
+
+def column_attribute(column):
+    """
+    Make an attribute of Individual that reads and writes the individual's row of a column of the population store
+    """
+    def get(self):
+        return getattr(self.population, column)[self.id]
+
+    def set(self, value):
+        getattr(self.population, column)[self.id] = value
+    return property(get, set)
 
-    def set_school_and_work_details(self, params):
-        """
-        Define the three following dates:
-         - go_to_school_date
-         - out_of_school_date
-         - out_of_work_date
-        """
-        age_go_to_school = params['school_age'] * 365.25 + random.uniform(-1., 1.) * 365.25  # in days
-        age_out_of_school = params['active_age_low'] * 365.25 + random.uniform(-3., 3.) * 365.25  # in days
-        age_out_of_work = random.uniform(55., 70.) * 365.25  # in days
 
-        self.programmed['go_to_school'] = self.dOB + round(age_go_to_school)
-        self.programmed['leave_school'] = self.dOB + round(age_out_of_school)
-        self.programmed['leave_work'] = self.dOB + round(age_out_of_work)
+def coded_attribute(column, values, codes):
+    """
+    Make an attribute of Individual stored as a small integer code in a column of the population store
+    """
+    def get(self):
+        return values[getattr(self.population, column)[self.id]]
 
-        active = random.binomial(1, params['perc_active']/100.)
-        if active == 1:
-            self.is_ever_gonna_work = True
+    def set(self, value):
+        getattr(self.population, column)[self.id] = codes[value]
+    return property(get, set)
 
-    def get_age_in_years(self, time):
-        return (time - self.dOB)/365.25
 
-    def get_relative_susceptibility(self, time, params):
-        """
-        Return the relative susceptibility to infection of the individual. This quantity depends on the following factors:
-         vaccination status, age ...
-        Returns the relative susceptibility. Baseline is for a non-vaccinated individual.
-        """
-        rr = 1.
-        if self.vaccinated:
-            age = self.get_age_in_years(time)
-            if age <= params['bcg_start_waning_year']:
-                efficacy = params['bcg_maximal_efficacy']
-            elif age <= params['bcg_end_waning_year']:
-                efficacy = params['bcg_maximal_efficacy'] - \
-                           (age - params['bcg_start_waning_year']) * \
-                                                            params['bcg_maximal_efficacy'] / \
-                                                            (params['bcg_end_waning_year'] - params['bcg_start_waning_year'])
-            else:
-                efficacy = 0.
-            rr *= 1. - efficacy
+class Individual(object):
+    """
+    This class defines the individuals. Individual characteristics are stored in the columns of a population.Population
+    object and the Individual object is a view over the row self.id of these columns.
+    TB strain and organ manifestation are stored as small-integer codes (see population.py). The tb_strain and tb_organ
+    attributes translate them into the strings used in the parameter names.
+    """
+    __slots__ = ('id', 'population', 'contacts_while_tb', 'group_ids', 'programmed', 'event_handles')
+
+    vaccine_immunity_duration = 15.  # in years
+
+    # individual non TB-specific characteristics
+    dOB = column_attribute('dOB')  # integer corresponding to the date of birth
+    diabetes = column_attribute('diabetes')  # not used for the moment
+    hiv = column_attribute('hiv')  # not used for the moment
+
+    # individual TB-specific characteristics
+    vaccinated = column_attribute('vaccinated')
+    ltbi = column_attribute('ltbi')
+    tb_strain_code = column_attribute('tb_strain_code')  # DS or MDR
+    tb_strain = coded_attribute('tb_strain_code', STRAINS, STRAIN_CODES)  # 'ds' or 'mdr'
+    active_tb = column_attribute('active_tb')
+    tb_organ_code = column_attribute('tb_organ_code')  # SMEARPOS, SMEARNEG or EXTRAPULMONARY
+    tb_organ = coded_attribute('tb_organ_code', ORGANS, ORGAN_CODES)
+    tb_detected = column_attribute('tb_detected')
+    tb_treated = column_attribute('tb_treated')
+    die_with_tb = column_attribute('die_with_tb')
+
+    is_ever_gonna_work = column_attribute('is_ever_gonna_work')
+
+    def __init__(self, id, household_id, dOB, population):
+        # individual non TB-specific characteristics
+        self.id = id  # integer, row index in the population store
+        self.population = population
+        population.reset(id)
+        self.household_id = household_id     # integer
+        self.dOB = dOB
 
-        if self.ltbi:
-            rr *= params['latent_protection_multiplier']
-        return rr
+        self.contacts_while_tb = None  # only allocated when the individual becomes an active TB case
 
-    def get_relative_infectiousness(self, params, time):
-        """
-            Return the relative infectiousness of the individual. This quantity depends on the following factors:
-            detection status, treatment status. Smear status
-            Returns the relative infectiousness. Baseline is for an undetected Smear-positive TB case.
-        """
-        if self.tb_organ == '_extrapulmonary':
-            return 0.
-
-        # age-specific profile for infectiousness
-        age = self.get_age_in_years(time)
-        if params['linear_scaleup_infectiousness']:
-            if age <= 10.:
-                rr = 0.
-            elif age >= 15:
-                rr = 1.
-            else:
-                rr = 0.2 * age - 2.
-        else:
-            # sigmoidal scale-up
-            rr = 1. / (1. + exp(-(age - params['infectiousness_switching_age'])))
+        # individual group characteristics (school and work related)
+        self.group_ids = []  # list of ids of the groups to which the individual is currently belonging
 
-        # organ-manifestation
-        if self.tb_organ == '_smearneg':
-            rr *= params['rel_infectiousness_smearneg']
+        # programmed events
+        self.programmed = ProgrammedView(population, id)
+        self.event_handles = {}  # handles of the events programmed in the model scheduler, keyed by event type
+
+    @property
+    def household_id(self):
+        return int(self.population.household_id[self.id])
 
-        # detection status
-        if 'detection' in self.programmed.keys() and time >= self.programmed['detection']:
-                rr *= params['rel_infectiousness_after_detect']
+    @household_id.setter
+    def household_id(self, value):
+        self.population.household_id[self.id] = value
 
-        return rr
+    def get_age_in_years(self, time):
+        return (time - self.dOB)/365.25
 
-    def infect_individual(self, time, params, strain):
+    def infect_individual(self, time, params, strain_code, random_streams):
         """
-        The individual gets infected with LTBI at time "time".
+        The individual gets infected with LTBI at time "time". strain_code is DS or MDR.
         """
         self.ltbi = True
-        self.tb_strain = strain
-        self.determine_activation(time, params)
+        self.tb_strain_code = strain_code
+        self.determine_activation(time, params, random_streams)
 
-    def determine_activation(self, time, params):
+    def determine_activation(self, time, params, random_streams):
         """
         Determine whether and when the infected individual will activate TB.
         """
-        time_to_activation = tb_activation.generate_an_activation_profile(self.get_age_in_years(time), params)
+        time_to_activation = tb_activation.generate_an_activation_profile(self.get_age_in_years(time), params,
+                                                                          random_streams)
 
         #  if time_to_activation is not None:
         if round(time + time_to_activation) < self.programmed['death']:
             # the individual will activate TB
             self.programmed['activation'] = round(time + time_to_activation)
 
-    def test_individual_for_ltbi(self, params):
+    def test_individual_for_ltbi(self, params, random_streams):
         """
         Apply screening to an individual. This individual may or may not be infected.
         return: a boolean variable indicating the result of the test (True for positif test)
         """
         if self.ltbi:  # infected individual.
-            test_result = bool(random.binomial(n=1, p=params['ltbi_test_sensitivity']))
+            test_result = random_streams.bernoulli(params['ltbi_test_sensitivity'])
         else:  # not infected
             if self.vaccinated:  # bcg affects specificity
-                test_result = bool(random.binomial(n=1, p=1. - params['ltbi_test_specificity_if_bcg']))
+                test_result = random_streams.bernoulli(1. - params['ltbi_test_specificity_if_bcg'])
             else:
-                test_result = bool(random.binomial(n=1, p=1. - params['ltbi_test_specificity_no_bcg']))
+                test_result = random_streams.bernoulli(1. - params['ltbi_test_specificity_no_bcg'])
         return test_result
 
-    def get_preventive_treatment(self, params, time=0, delayed=False):
+    def get_preventive_treatment(self, params, random_streams, time=0, delayed=False):
         """
         The individual receives preventive treatment. If the individual is currently infected, infection vanishes with
         probability pt_efficacy. The efficacy parameter represents a combined rate of adherence and treatment efficacy.
@@ -209,8 +254,7 @@ class Individual:
         """
         date_prevented_activation = None
         if self.ltbi:
-            success = random.binomial(n=1, p=params['pt_efficacy'])
-            if success == 1:
+            if random_streams.bernoulli(params['pt_efficacy']):
                 self.ltbi = False
                 if 'activation' in self.programmed.keys():
                     if not delayed or (delayed and (time + params['pt_delay_due_to_tst']) <= self.programmed['activation']):
@@ -225,8 +269,10 @@ class Individual:
         """
         self.active_tb = True
         self.ltbi = False  # convention
+        # sets of (id, generation) pairs, see Population.get_references
+        self.contacts_while_tb = {'household': set([]), 'school': set([]), 'workplace': set([]), 'community': set([])}
 
-    def define_tb_outcome(self, time, params, tx_success_prop):
+    def define_tb_outcome(self, time, params, tx_success_prop, random_streams):
         """
         This method determines the outcome of the individual's active TB episode, accounting for both natural history
          and clinical management.
@@ -240,20 +286,18 @@ class Individual:
                         (100. - params['perc_smearpos'] - params['perc_extrapulmonary'])/100.,  # smear_neg
                         params['perc_extrapulmonary']/100.]  # extrapulmonary
 
-        draw = random.multinomial(1, organ_probas)
-        index = int(nonzero(draw)[0])
-        self.tb_organ = ['_smearpos', '_smearneg', '_extrapulmonary'][index]
+        self.tb_organ_code = [SMEARPOS, SMEARNEG, EXTRAPULMONARY][random_streams.categorical(organ_probas)]
 
         # Natural history of TB
-        if self.tb_organ == '_smearpos':
+        if self.tb_organ_code == SMEARPOS:
             organ_for_natural_history = '_smearpos'
         else:
             organ_for_natural_history = '_closed_tb'
 
-        t_to_sp_cure = round(365.25 * random.exponential(scale=1. / params['rate_sp_cure' +
-                                                                           organ_for_natural_history]))
-        t_to_tb_death = round(365.25 * random.exponential(scale=1. / params['rate_tb_mortality' +
-                                                                            organ_for_natural_history]))
+        t_to_sp_cure = round(365.25 * random_streams.exponential(scale=1. / params['rate_sp_cure' +
+                                                                                   organ_for_natural_history]))
+        t_to_tb_death = round(365.25 * random_streams.exponential(scale=1. / params['rate_tb_mortality' +
+                                                                                    organ_for_natural_history]))
         if t_to_sp_cure <= t_to_tb_death:
             sp_cure = 1
             t_s = t_to_sp_cure
@@ -264,10 +308,9 @@ class Individual:
             t_m = t_to_tb_death
 
         # Random generation of programmatic durations
-        [t_d, t_t] = random.exponential(scale=[365.25/params['lambda_timeto_detection' + organ_for_natural_history],
-                                               params['time_to_treatment']])
-        t_d = round(t_d)
-        t_t = round(t_t)
+        t_d = round(random_streams.exponential(scale=365.25/params['lambda_timeto_detection' +
+                                                                   organ_for_natural_history]))
+        t_t = round(random_streams.exponential(scale=params['time_to_treatment']))
 
         # In case of spontaneous cure occurring before detection
         if sp_cure == 1 and t_d >= t_s:
@@ -298,46 +341,44 @@ class Individual:
             # In case of treatment effectively happening
             if time + t_d + t_t < self.programmed['death']:
                 strain_multiplier = 1.
-                if self.tb_strain == 'mdr':
+                if self.tb_strain_code == MDR:
                     strain_multiplier = params['perc_dst_coverage'] / 100.
                     strain_multiplier *= params['relative_treatment_success_rate_mdr']
-                tx_cure = random.binomial(n=1, p=tx_success_prop * strain_multiplier)
-                if tx_cure == 1:
+                tx_cure = random_streams.bernoulli(tx_success_prop * strain_multiplier)
+                if tx_cure:
                     if t_d + t_t < t_s: # will not overwrite the sp_cure date if it happens before treatment
                         self.programmed['recovery'] = time + t_d + t_t
                         to_be_returned['recovery'] = self.programmed['recovery']
                         to_be_returned['time_active'] = t_d + t_t
-                elif tx_cure == 0 and self.tb_strain == 'ds':  # there is a risk of DR amplification
-                    ampli = random.binomial(n=1, p=params['perc_risk_amplification'] / 100.)
-                    if ampli == 1:
-                        self.tb_strain = 'mdr'  # may be improved in the future as the amplification should occur later
+                elif self.tb_strain_code == DS:  # there is a risk of DR amplification
+                    if random_streams.bernoulli(params['perc_risk_amplification'] / 100.):
+                        self.tb_strain_code = MDR  # may be improved in the future as the amplification should occur later
                         to_be_returned['dr_amplification'] = time + t_d + t_t
             return to_be_returned
         # Otherwise, natural death occurs before detection
         else:
             return {'time_active': self.programmed['death'] - time}
 
-    def overwrite_tb_outcome_after_acf_detection(self, time, params, tx_success_prop):
+    def overwrite_tb_outcome_after_acf_detection(self, time, params, tx_success_prop, random_streams):
         self.detect_tb()
         # work out treatment outcome
-        t_t = round(random.exponential(scale=params['time_to_treatment']))
+        t_t = round(random_streams.exponential(scale=params['time_to_treatment']))
 
         self.programmed['detection'] = time
         to_be_returned = {}  #'detection': self.programmed['detection']}
         if time + t_t < self.programmed['death']:
             strain_multiplier = 1.
-            if self.tb_strain == 'mdr':
+            if self.tb_strain_code == MDR:
                 strain_multiplier = params['perc_dst_coverage'] / 100.
                 strain_multiplier *= params['relative_treatment_success_rate_mdr']
-            tx_cure = random.binomial(n=1, p=tx_success_prop * strain_multiplier)
-            if tx_cure == 1:
+            tx_cure = random_streams.bernoulli(tx_success_prop * strain_multiplier)
+            if tx_cure:
                 if 'recovery' not in self.programmed.keys() or self.programmed['recovery'] > time + t_t:
                     self.programmed['recovery'] = time + t_t
                 to_be_returned['recovery'] = self.programmed['recovery']
-            elif tx_cure == 0 and self.tb_strain == 'ds':  # there is a risk of DR amplification
-                ampli = random.binomial(n=1, p=params['perc_risk_amplification'] / 100.)
-                if ampli == 1:
-                    self.tb_strain = 'mdr'  # may be improved in the future as the amplification should occur later
+            elif self.tb_strain_code == DS:  # there is a risk of DR amplification
+                if random_streams.bernoulli(params['perc_risk_amplification'] / 100.):
+                    self.tb_strain_code = MDR  # may be improved in the future as the amplification should occur later
                     to_be_returned['dr_amplification'] = time + t_t
         return to_be_returned
 
@@ -355,7 +396,7 @@ class Individual:
         self.tb_detected = False
         self.tb_treated = False
         self.die_with_tb = False
-        self.contacts_while_tb = {'household': set([]), 'school': set([]), 'workplace': set([]), 'community': set([])}
+        self.contacts_while_tb = None
 
         if 'activation' in self.programmed.keys():
             del(self.programmed['activation'])
@@ -373,7 +414,7 @@ class Individual:
         self.vaccinated = False
         self.group_ids = []
 
-        self.contacts_while_tb = {'household': set([]), 'school': ([]), 'workplace': ([]), 'community': ([])}
+        self.contacts_while_tb = None
 
         self.tb_organ = None
 
@@ -383,15 +424,8 @@ class Individual:
 
         self.is_ever_gonna_work = False
 
-        self.programmed = {}
-
-    def assign_vaccination_status(self, coverage):
-        """
-        When an individual is born, vaccination occurs with probability 'coverage'
-        """
-        vacc = random.binomial(1, coverage)
-        if vacc == 1:
-            self.vaccinated = True
+        self.programmed.clear()
+        self.event_handles = {}
 
     def is_in_subgroup(self, subgroup, time=None):
         """
@@ -425,3 +459,10 @@ if __name__ == '__main__':
         ages.append(draw_life_duration_using_death_rates())
 
     print sum(ages)/len(ages)
+
+    # memory report
+    for n in [100000, 1000000]:
+        bytes_per_agent = measure_memory_per_agent(n)
+        print "Population of " + str(n) + ": " + str(int(bytes_per_agent['total'])) + " bytes per agent (" + \
+              ", ".join([key + ": " + str(int(val)) for key, val in sorted(bytes_per_agent.items()) if key != 'total']) +\
+              "). Total: " + str(round(bytes_per_agent['total'] * n / 1.e6, 1)) + " MB"
@@ -3,6 +3,7 @@ from scipy.optimize import minimize
 from openpyxl import load_workbook, Workbook
 from os import path
 from math import floor, ceil
+from age_preference import age_preference_function
 
 contact_base_path = path.join('prem_data')
 
@@ -88,15 +89,6 @@ def extract_sub_matrix(matrix, age_min, age_max):
     relevant_x_cat = ["X_" + str(indice) for indice in relevant_x_cat]
     return {'matrix': matrix[index_min:index_max, index_min:index_max], 'relevant_x_cat': relevant_x_cat}
 
-def age_preference_function(age_difference, sd):
-    """
-    Given the age difference between two individuals, computes the relative probability of contact.
-    Reference: no age difference.
-    location_type is either "school" or "workplace"
-    """
-    ratio = np.exp(-age_difference ** 2 / (2 * sd ** 2))
-    return ratio
-
 def calibrate_param_for_age_preference(matrix, age_pyramid, relevant_x_cat):
     """
     Given a contact rate matrix as reported in Prem et al and an age-pyramid for the background population,
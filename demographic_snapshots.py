@@ -0,0 +1,130 @@
+import cPickle as pickle
+import hashlib
+import os
+import numpy as np
+
+# model attributes that are not part of a snapshot: run identifiers, parameters, attributes copied from the data and
+# the individual-level random streams, which are derived from the state of the global NumPy generator
+EXCLUDED_ATTRIBUTES = ['i_seed', 'scenario', 'i_run', 'timer', 'initialised', 'status_file_created', 'params',
+                       'scale_up_functions', 'birth_numbers_function', 'contact_rates_matrices',
+                       'prem_contact_rate_functions', 'sd_agepref_work', 'age_pyramid', 'pool_of_life_durations',
+                       'random_streams']
+
+
+class RecordingDict(dict):
+    """
+    Dictionary recording the keys that are read
+    """
+    def __init__(self, items=()):
+        dict.__init__(self, items)
+        self.keys_read = set()
+
+    def __getitem__(self, key):
+        self.keys_read.add(key)
+        return dict.__getitem__(self, key)
+
+
+class RecordingFunction(object):
+    """
+    Function recording the arguments it is called with
+    """
+    def __init__(self, function):
+        self.function = function
+        self.arguments = set()
+
+    def __call__(self, x):
+        self.arguments.add(x)
+        return self.function(x)
+
+
+def hash_value(value, md5):
+    """
+    Feed the md5 object with a representation of value that does not depend on the ordering of the dictionary keys
+    """
+    if isinstance(value, dict):
+        md5.update('{')
+        for key in sorted(value.keys()):
+            hash_value(key, md5)
+            hash_value(value[key], md5)
+        md5.update('}')
+    elif isinstance(value, (list, tuple)):
+        md5.update('[')
+        for item in value:
+            hash_value(item, md5)
+        md5.update(']')
+    elif isinstance(value, np.ndarray):
+        md5.update(str(value.dtype) + str(value.shape))
+        md5.update(np.ascontiguousarray(value).tobytes())
+    else:
+        md5.update(repr(value))
+
+
+class SnapshotCache(object):
+    """
+    On-disk storage of the model states reached at the end of the demographic burn-in. When a snapshot is stored, the
+    inputs read during the burn-in are recorded: the names of the parameters and the arguments passed to the
+    scale-up and birth-number functions (see Model.start_recording_inputs). A snapshot is identified by a hash of the
+    values of these inputs at the start of the burn-in (see Model.get_demographic_inputs), so that a change in any of
+    them leads to a new burn-in.
+    Snapshots are saved with cPickle rather than dill, which is several times slower on the large number of objects
+    making up the population.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "demographic_inputs.pickle")
+
+    def get_key(self, inputs):
+        md5 = hashlib.md5()
+        hash_value(inputs, md5)
+        return md5.hexdigest()
+
+    def get_file_path(self, key):
+        return os.path.join(self.directory, "demographic_snapshot_" + key + ".pickle")
+
+    def load_index(self):
+        """
+        return: the list of the descriptions of the inputs read by the stored burn-ins, most recent first
+        """
+        if not os.path.isfile(self.index_path):
+            return []
+        file_stream = open(self.index_path, "rb")
+        index = pickle.load(file_stream)
+        file_stream.close()
+        return index
+
+    def store(self, model_to_store, demographic_inputs):
+        """
+        Store the state of model_to_store. demographic_inputs holds the values the inputs had at the start of the
+        burn-in (see Model.get_demographic_inputs).
+        """
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        key = self.get_key(demographic_inputs)
+        state = {name: value for name, value in model_to_store.__dict__.iteritems()
+                 if name not in EXCLUDED_ATTRIBUTES}
+        file_stream = open(self.get_file_path(key), "wb")
+        pickle.dump(state, file_stream, pickle.HIGHEST_PROTOCOL)
+        file_stream.close()
+
+        inputs_read = demographic_inputs['inputs_read']
+        index = self.load_index()
+        if inputs_read in index:
+            index.remove(inputs_read)
+        file_stream = open(self.index_path, "wb")
+        pickle.dump([inputs_read] + index, file_stream, pickle.HIGHEST_PROTOCOL)
+        file_stream.close()
+
+    def restore(self, model_to_restore, data):
+        """
+        Load into model_to_restore a snapshot whose inputs have the same values as those of model_to_restore
+        return: the key of the snapshot, or None if there is no such snapshot
+        """
+        for inputs_read in self.load_index():
+            key = self.get_key(model_to_restore.get_demographic_inputs(data, inputs_read, model_to_restore.params))
+            file_path = self.get_file_path(key)
+            if os.path.isfile(file_path):
+                file_stream = open(file_path, "rb")
+                model_to_restore.__dict__.update(pickle.load(file_stream))
+                file_stream.close()
+                return key
+        return None
@@ -1,6 +1,9 @@
 from numpy import random
 
-class household:
+class household(object):
+    __slots__ = ('id', 'size', 'individual_ids', 'school_id', 'repopulate_date', 'minimum_time_to_next_baby',
+                 'last_baby_time')
+
     def __init__(self, id):
         self.id = id
         self.size = 0
@@ -432,12 +432,12 @@ class data:
     def workout_universal_methods(self):
         """
         According to which outputs are requested (plot, tables), determine whether universal methods are needed. A
-        universal method is a method that requires to loop through each individual at each time-step.
+        universal method is a measure over the whole population at each time-step.
         """
         self.console['run_universal_methods'] = False
         if self.console['plot_ts_mean_age'] or self.console['plot_ts_prop_under_5']:
             self.console['run_universal_methods'] = True
-            print "Universal methods are requested. The running time will be increased"
+            print "Universal methods are requested"
 
     def workout_birth_rates(self):
         """
@@ -0,0 +1,143 @@
+import numpy as np
+from collections import deque, OrderedDict
+
+
+class IndexedSet(object):
+    """
+    Set of individual ids supporting O(1) insertion, removal and membership tests.
+    The members are stored contiguously in a NumPy array (see the ids attribute) that vectorised code can read directly,
+    and the position of each member in this array is recorded so that a member can be removed by swapping it with the
+    last one. The order of the members is therefore not preserved.
+    The version attribute is incremented whenever the membership changes, so that data derived from the members can be
+    cached.
+    """
+    __slots__ = ('members', 'positions', 'size', 'version')
+
+    def __init__(self, ind_ids=()):
+        self.members = np.zeros(max(len(ind_ids), 4), dtype=np.int64)
+        self.positions = {}  # keyed by member ids, valued with the positions of the members in self.members
+        self.size = 0
+        self.version = 0
+        for ind_id in ind_ids:
+            self.add(ind_id)
+
+    @property
+    def ids(self):
+        """
+        Dense array of the member ids. This is a view: it must be copied if the set is modified while it is used.
+        """
+        return self.members[:self.size]
+
+    def add(self, ind_id):
+        if ind_id in self.positions:
+            return
+        if self.size == len(self.members):
+            self.members = np.concatenate((self.members, np.zeros(self.size, dtype=np.int64)))
+        self.members[self.size] = ind_id
+        self.positions[ind_id] = self.size
+        self.size += 1
+        self.version += 1
+
+    def remove(self, ind_id):
+        """
+        Remove ind_id from the set. Raise KeyError if ind_id is not a member.
+        """
+        position = self.positions.pop(ind_id)
+        self.size -= 1
+        self.version += 1
+        if position < self.size:  # move the last member to the freed position
+            last_id = self.members[self.size]
+            self.members[position] = last_id
+            self.positions[last_id] = position
+
+    def discard(self, ind_id):
+        if ind_id in self.positions:
+            self.remove(ind_id)
+
+    def __contains__(self, ind_id):
+        return ind_id in self.positions
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+
+class OrderedSet(object):
+    """
+    Set preserving the insertion order of its members, with O(1) insertion, removal and access to the oldest member.
+    """
+    __slots__ = ('members', )
+
+    def __init__(self, items=()):
+        self.members = OrderedDict()
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        self.members[item] = None
+
+    def discard(self, item):
+        self.members.pop(item, None)
+
+    def pop_first(self):
+        """
+        Remove and return the oldest member
+        """
+        return self.members.popitem(last=False)[0]
+
+    def __contains__(self, item):
+        return item in self.members
+
+    def __len__(self):
+        return len(self.members)
+
+    def __iter__(self):
+        return iter(self.members)
+
+
+class WaitingList(object):
+    """
+    First-in-first-out queue of individual ids, each entry being associated with the time at which it was added. Times
+    must be added in non-decreasing order so that the queue is also sorted by time. Removing an individual from the
+    queue costs O(1): the queue entry is only discarded when it reaches the front of the queue.
+    """
+    __slots__ = ('queue', 'entry_times')
+
+    def __init__(self):
+        self.queue = deque()  # (ind_id, time) tuples, including the entries of removed individuals
+        self.entry_times = {}  # keyed by the ids of the individuals currently waiting, valued with their entry times
+
+    def add(self, ind_id, time):
+        self.entry_times[ind_id] = time
+        self.queue.append((ind_id, time))
+
+    def discard(self, ind_id):
+        self.entry_times.pop(ind_id, None)
+
+    def drop_removed_entries(self):
+        while len(self.queue) > 0 and self.entry_times.get(self.queue[0][0]) != self.queue[0][1]:
+            self.queue.popleft()
+
+    def peek(self):
+        """
+        return: (ind_id, time) for the individual that has been waiting for the longest time
+        """
+        self.drop_removed_entries()
+        return self.queue[0]
+
+    def pop(self):
+        """
+        Remove the individual that has been waiting for the longest time from the queue and return its id
+        """
+        self.drop_removed_entries()
+        ind_id = self.queue.popleft()[0]
+        del self.entry_times[ind_id]
+        return ind_id
+
+    def __contains__(self, ind_id):
+        return ind_id in self.entry_times
+
+    def __len__(self):
+        return len(self.entry_times)
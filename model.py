@@ -1,29 +1,26 @@
-from sys import exit, stdout
+from sys import exit
+import age_index
+import age_preference
 import agent
+import demographic_snapshots
 import household
+import membership
+import population
+import random_streams
+import sampling
+import scheduler
 import toolkit
 import numpy as np
 import copy
 from math import ceil, floor
 import os
-from itertools import repeat
+from itertools import islice, chain
 from datetime import datetime
-from importData import get_agecategory
 import dill
 import time
 from calibration_targets import calib_targets
 
 
-def age_preference_function(age_difference, sigma):
-    """
-    Given the age difference between two individuals, computes the relative probability of contact.
-    Reference: no age difference.
-    location_type is either "school" or "workplace"
-    """
-    relative_risk = np.exp(-age_difference ** 2 / (2 * sigma ** 2))
-    return relative_risk
-
-
 class Model:
     """
     Defines the whole population and interactions between individuals
@@ -34,6 +31,7 @@ class Model:
         self.scenario = scenario
         self.i_run = i_run
         self.timer = time.time()
+        self.random_streams = random_streams.RandomStreams()  # buffered draws for individual-level events
         self.params = {}
         self.age_pyramid = data.age_pyramid
         self.fertility_replacement = True  # default model behaviour. May switch during simulation
@@ -49,24 +47,23 @@ class Model:
         self.contact_rates_matrices = data.contact_rates_matrices
         self.prem_contact_rate_functions = data.prem_contact_rate_functions
         self.sd_agepref_work = data.sd_agepref_work
+        self.susceptibility_table = None  # agent.SusceptibilityTable object, built at the first request
         self.individuals = {} # dictionary of all individuals keyed by their unique ID
+        self.population_data = population.Population()  # columnar storage of the individual characteristics
         self.households = {} # dictionary of all households keyed by their unique ID
-        self.last_ind_id = 0
-        self.dates_of_birth = {}
-        self.ind_by_agegroup = {}
-        self.initialise_agegroups()
+        self.age_index = age_index.CohortIndex(self.population_data)  # living individuals indexed by birth cohort
         self.age_pyramid_date = 0
         self.birth_numbers = 0  # reset at each step
+        self.nb_replacement_births = 0  # nb of deaths since the last replacement births (fertility replacement only)
 
         self.birth_numbers_function = data.birth_numbers_function
 
-        self.last_ind_id = -1
         self.population = 0
         self.n_households = 0
         self.greatest_ind_id = 0
-        self.eligible_hh_for_birth = {}  # keys: hh ids, values: hh sizes
-        self.individuals_want_to_move = {}  # dictionary of ind ids as keys and desired moving times at values
-        self.empty_households = []  # list of empty households
+        self.eligible_hh_for_birth = sampling.WeightedSampler()  # keys: hh ids, weights: inverse of the hh sizes
+        self.individuals_want_to_move = membership.WaitingList()  # ind ids queued with their desired moving times
+        self.empty_households = membership.OrderedSet()  # ids of the empty households, oldest first
 
         self.time = int(0)
         self.last_year_completed = 0
@@ -77,17 +74,20 @@ class Model:
         self.mean_age = 0.  # average age of the population
         self.prop_under_5 = 0.
 
+        self.locations = ['school', 'workplace', 'household', 'community']  # locations of the contacts
         self.contact_matrices = {}
         self.n_contacts = {}
         self.initialise_contact_matrices()
 
         self.pool_of_life_durations = None
 
-        self.groups = {}  # keyed by group ids. valued with the ids of individuals that belong to each group.
+        self.groups = {}  # keyed by group ids. valued with IndexedSet objects listing the members of each group.
+        self.group_age_cache = {}  # keyed by group ids. see get_group_age_data
         self.groups_by_type = {'schools': [], 'workplaces': []}  #  list the group ids by group type
         self.group_types = {}  #  reverse version of groups_by_type. Keys are group ids and values are group types
 
-        self.programmed_events = {'death': {}, 'leave_home': {}, 'go_to_school': {}, 'leave_school': {}, 'leave_work': {}}
+        self.programmed_events = scheduler.EventScheduler(['death', 'leave_home', 'go_to_school', 'leave_school',
+                                                           'leave_work'])
 
         # storage units for model outputs
         self.timeseries_log = {
@@ -112,7 +112,7 @@ class Model:
         for key in ['contact', 'transmission', 'transmission_end_tb']:
             self.contact_matrices[key] = {}
             self.n_contacts[key] = {}
-            for location in ['school', 'workplace', 'household', 'community']:
+            for location in self.locations:
                 self.contact_matrices[key][location] = np.zeros((101, 101))  # null matrix 100x100
                 self.n_contacts[key][location] = 0
 
@@ -128,20 +128,83 @@ class Model:
         self.process_cdr()
         self.process_organ_proportions()
 
-    def initialise_model(self, data):
+    def initialise_model(self, data, snapshot_cache=None):
+        """
+        Build the population and run the burn-in periods. If a demographic_snapshots.SnapshotCache object is provided,
+        the state reached at the end of the demographic burn-in is loaded from the cache when available, and stored
+        otherwise.
+        """
+        if snapshot_cache is not None:
+            self.start_recording_inputs()
         self.collect_params(data)
         self.population = self.params['population']
         self.evaluate_all_scale_up_functions()
 
         if self.scenario != 'init':
             self.collect_scenario_specific_params(data)
-        self.initialise_timeseries_storage()
-        self.generate_households()
-        self.populate_households()
-        self.build_schools_and_workplaces()
-
         self.tb_has_started = False
-        self.run()
+
+        # TB starts during the first time-step that ends after the demographic burn-in
+        n_demographic_iterations = max(int(ceil(self.params['duration_burning_demo'] * 365.25 /
+                                                self.params['time_step'])) - 1, 0)
+        key = None
+        if snapshot_cache is not None:
+            key = snapshot_cache.restore(self, data)
+        if key is not None:
+            self.stop_recording_inputs(data)
+            print "Demographic burn-in loaded from snapshot " + key
+            self.evaluate_all_scale_up_functions()  # the parameters derived from the scale-up functions
+        else:
+            initial_params = dict(self.params)  # some parameters are updated during the burn-in
+            self.initialise_timeseries_storage()
+            self.generate_households()
+            self.populate_households()
+            self.build_schools_and_workplaces()
+            self.run_iterations(n_demographic_iterations)
+            if snapshot_cache is not None:
+                inputs_read = self.stop_recording_inputs(data)
+                snapshot_cache.store(self, self.get_demographic_inputs(data, inputs_read, initial_params))
+
+        self.run(n_iterations=self.params['n_iterations'] - n_demographic_iterations)
+
+    def start_recording_inputs(self):
+        """
+        Record the parameters read by the model and the arguments passed to the scale-up and birth-number functions,
+        until stop_recording_inputs is called
+        """
+        self.params = demographic_snapshots.RecordingDict(self.params)
+        self.scale_up_functions = {name: demographic_snapshots.RecordingFunction(function)
+                                   for name, function in self.scale_up_functions.iteritems()}
+        self.birth_numbers_function = demographic_snapshots.RecordingFunction(self.birth_numbers_function)
+
+    def stop_recording_inputs(self, data):
+        """
+        return: a description of the inputs read since start_recording_inputs was called
+        """
+        inputs_read = {'params': sorted(self.params.keys_read),
+                       'scale_up_functions': {name: sorted(function.arguments)
+                                              for name, function in self.scale_up_functions.iteritems()},
+                       'birth_numbers_function': sorted(self.birth_numbers_function.arguments)}
+        self.params = dict(self.params)
+        self.scale_up_functions = data.scale_up_functions
+        self.birth_numbers_function = data.birth_numbers_function
+        return inputs_read
+
+    def get_demographic_inputs(self, data, inputs_read, params):
+        """
+        Return the values of the inputs described by inputs_read (see stop_recording_inputs), taking the parameters
+        from params, together with the age pyramid and the pool of life durations.
+        """
+        params = dict(params)  # plain copy, so that reading it is not recorded
+        return {'inputs_read': inputs_read,
+                'params': {name: params.get(name) for name in inputs_read['params']},
+                'scale_up_functions': {name: [data.scale_up_functions[name](x) for x in arguments]
+                                       if name in data.scale_up_functions else None
+                                       for name, arguments in inputs_read['scale_up_functions'].iteritems()},
+                'birth_numbers_function': [data.birth_numbers_function(x)
+                                           for x in inputs_read['birth_numbers_function']],
+                'age_pyramid': self.age_pyramid,
+                'pool_of_life_durations': self.pool_of_life_durations}
 
     """
             Methods related to model initialisation (parameter processing + storage initialisation)
@@ -235,18 +298,6 @@ class Model:
         for key, val in self.params['rr_transmission_by_location'].iteritems():
             self.params['rr_transmission_by_location'][key] = val/ref_rr
 
-    def initialise_agegroups(self):
-        self.ind_by_agegroup = {}
-        for cat_ind in range(16):
-            age_cat = 'X_' + str(cat_ind+1)
-            self.ind_by_agegroup[age_cat] = []
-
-    def update_ind_by_agegroup(self):
-        self.initialise_agegroups()
-        for key, value in self.dates_of_birth.iteritems():
-            age = (self.time - value) / 365.25
-            self.ind_by_agegroup[get_agecategory(age,'prem')].append(key)
-
     """
              Methods related to population initialisation (households and individuals + generation)
     """
@@ -262,47 +313,46 @@ class Model:
 
     def populate_households(self):
         """
-        Populate existing households
+        Populate existing households. The ages of all the individuals are drawn at once and the individuals are added
+        in bulk.
         """
-        # Allocate the adults first
-        parenting_households = [] # store the hh ids where kids can be allocated during the initialisation phase
-        for h in self.households.values():
-            parents_age = np.random.uniform(self.params['minimal_age_leave_hh'], 100.)  # btwn 18 and 100.
-            h.repopulate_date = self.time - 365.25*(parents_age - self.params['minimal_age_leave_hh'])
-            if self.time - h.repopulate_date < 365.25*20.:
-                self.eligible_hh_for_birth[h.id] = 2
-            if parents_age < 60.:  # we generate a couple and we allow kids to join
-                for j in [1, 2]:
-                    self.add_new_individual_in_hh(h_id=h.id, age=parents_age)
-                parenting_households.append(h.id)
-            else:  # we generate a couple
-                self.add_new_individual_in_hh(h_id=h.id, age=parents_age)
-                self.add_new_individual_in_hh(h_id=h.id, age=parents_age)
+        # Allocate the adults first: a couple in each household
+        hh_ids = np.array(self.households.keys(), dtype=int)
+        parents_ages = np.random.uniform(self.params['minimal_age_leave_hh'], 100., len(hh_ids))  # btwn 18 and 100.
+        repopulate_dates = self.time - 365.25*(parents_ages - self.params['minimal_age_leave_hh'])
+        for hh_id, repopulate_date in zip(hh_ids.tolist(), repopulate_dates.tolist()):
+            self.households[hh_id].repopulate_date = repopulate_date
+            if self.time - repopulate_date < 365.25*20.:
+                self.eligible_hh_for_birth[hh_id] = 1. / 2.
+        # kids are only allowed to join the couples younger than 60
+        parenting_households = hh_ids[parents_ages < 60.]
 
         # Allocate the remaining individuals as kids
-        n_kids = self.population - (self.last_ind_id + 1)
-        for i in range(n_kids):
-            hh_id = parenting_households[i % len(parenting_households)]
-            kids_age = np.random.uniform(0., 40.)
-            self.add_new_individual_in_hh(h_id=hh_id, age=kids_age)
-
-    def add_new_individual_in_hh(self, h_id, age, ind_id=None):
-        if ind_id is None:
-            ind_id = self.last_ind_id + 1
-            self.last_ind_id += 1
-
-        self.individuals[ind_id] = agent.Individual(id=ind_id, household_id=h_id, dOB=0.)
-
-        self.set_birth_and_death(ind_id, age=age)
-        if age == 0.:
-            age_cat = 'X_1'
-        else:
-            age_cat = get_agecategory(age, 'prem')
-        self.ind_by_agegroup[age_cat].append(ind_id)
+        n_kids = self.population - 2 * len(hh_ids)
+        kids_hh_ids = parenting_households[np.arange(n_kids) % len(parenting_households)]
+        kids_ages = np.random.uniform(0., 40., n_kids)
 
-        self.households[h_id].individual_ids.append(ind_id)
-        self.households[h_id].size += 1
-        self.households[h_id].last_baby_time = self.time
+        self.add_new_individuals_in_hh(np.concatenate((np.repeat(hh_ids, 2), kids_hh_ids)),
+                                       np.concatenate((np.repeat(parents_ages, 2), kids_ages)))
+
+    def add_new_individuals_in_hh(self, hh_ids, ages):
+        """
+        Create len(hh_ids) individuals, individual i joining the household hh_ids[i] at the age ages[i] (in years).
+        return: an array with the ids of the new individuals
+        """
+        ind_ids = self.population_data.allocate_many(len(hh_ids))
+        hh_ids = np.asarray(hh_ids).tolist()
+        for ind_id, hh_id in zip(ind_ids.tolist(), hh_ids):
+            self.individuals[ind_id] = agent.Individual(id=ind_id, household_id=hh_id, dOB=0.,
+                                                        population=self.population_data)
+        self.set_births_and_deaths(ind_ids, ages)
+
+        for ind_id, hh_id in zip(ind_ids.tolist(), hh_ids):
+            self.age_index.add(ind_id)
+            self.households[hh_id].individual_ids.append(ind_id)
+            self.households[hh_id].size += 1
+            self.households[hh_id].last_baby_time = self.time
+        return ind_ids
 
     def build_schools_and_workplaces(self):
         """
@@ -312,10 +362,11 @@ class Model:
         # Build schools and assign the different households to the schools
         n_schools = int(ceil(self.params['n_schools'] * self.population / 1.e5))
         self.groups_by_type['schools'] = range(1, n_schools + 1)
-        for hh_id in self.households.keys():
-            self.households[hh_id].school_id = np.random.choice(self.groups_by_type['schools'], 1)[0]
+        school_ids = np.random.choice(self.groups_by_type['schools'], len(self.households))
+        for h, school_id in zip(self.households.values(), school_ids.tolist()):
+            h.school_id = school_id
         for school_id in self.groups_by_type['schools']:
-            self.groups[school_id] = []
+            self.groups[school_id] = membership.IndexedSet()
             self.group_types[school_id] = 'school'
 
         # Build workplaces
@@ -324,7 +375,7 @@ class Model:
         n_workplaces = int(ceil(n_working_individuals / (self.params['n_colleagues'] + 1.)))
         self.groups_by_type['workplaces'] = range(n_schools + 1, n_schools + n_workplaces + 1)
         for workplace_id in self.groups_by_type['workplaces']:
-            self.groups[workplace_id] = []
+            self.groups[workplace_id] = membership.IndexedSet()
             self.group_types[workplace_id] = 'workplace'
 
     def adjust_nb_of_schools_and_workplaces(self):
@@ -349,7 +400,7 @@ class Model:
         for _ in range(n_to_add):
             # create the group and add to relevant model attributes
             new_group_id = max(self.groups.keys()) + 1
-            self.groups[new_group_id] = []  # create an empty group
+            self.groups[new_group_id] = membership.IndexedSet()  # create an empty group
             self.groups_by_type[group_type + 's'].append(new_group_id)
             self.group_types[new_group_id] = group_type
 
@@ -383,7 +434,7 @@ class Model:
                                                  replace=False)
             for prev_workplace_id in picked_workplaces:
                 if len(self.groups[prev_workplace_id]) > 0:
-                    ind_id = np.random.choice(self.groups[prev_workplace_id], 1)[0]
+                    ind_id = np.random.choice(self.groups[prev_workplace_id].ids, 1)[0]
                     self.make_individual_change_group(ind_id, prev_workplace_id, new_group_id)
 
     def make_individual_change_group(self, ind_id, prev_group_id, new_group_id):
@@ -394,8 +445,8 @@ class Model:
         self.individuals[ind_id].group_ids = [new_group_id]
 
         # from the model perspective
-        self.groups[prev_group_id] = [indd_id  for indd_id in self.groups[prev_group_id] if indd_id != ind_id]
-        self.groups[new_group_id].append(ind_id)
+        self.groups[prev_group_id].remove(ind_id)
+        self.groups[new_group_id].add(ind_id)
 
     def remove_groups(self, group_type, n_to_remove):
         closing_group_ids = np.random.choice(self.groups_by_type[group_type + 's'], n_to_remove, replace=False)
@@ -404,7 +455,7 @@ class Model:
             self.groups_by_type[group_type + 's'] = [g_id for g_id in self.groups_by_type[group_type + 's'] if
                                                      g_id != prev_group_id]
             del(self.group_types[prev_group_id])
-            ind_ids_to_move = self.groups[prev_group_id]
+            ind_ids_to_move = list(self.groups[prev_group_id])
             if group_type == 'school':  # we need to assign relevant households to new schools
                 self.reassign_schools_after_school_closure(prev_group_id)
             for ind_id in ind_ids_to_move:
@@ -415,6 +466,7 @@ class Model:
                 self.make_individual_change_group(ind_id, prev_group_id, new_group_id)
 
             del(self.groups[prev_group_id])
+            self.group_age_cache.pop(prev_group_id, None)
 
     def reassign_schools_after_school_closure(self, closing_school_id):
         """
@@ -432,8 +484,8 @@ class Model:
         if self.params['init_n_tb_cases'] > 0:
             diseased_indices = np.random.choice(self.individuals.keys(), self.params['init_n_tb_cases'], replace=False)
             for ind in diseased_indices:
-                tb_strain = ['ds', 'mdr'][int(np.random.binomial(n=1, p=self.params['init_mdr_perc'] / 100.))]
-                self.individuals[ind].tb_strain = tb_strain
+                is_mdr = int(np.random.binomial(n=1, p=self.params['init_mdr_perc'] / 100.))
+                self.individuals[ind].tb_strain_code = [population.DS, population.MDR][is_mdr]
                 self.make_individual_activate_tb(ind, init=True)
                 self.individuals[ind].programmed['activation'] = self.time
 
@@ -449,8 +501,8 @@ class Model:
             infected_indices = np.random.choice(self.individuals.keys(), int(n_ltbi), replace=False)
             for ind in infected_indices:
                 if not self.individuals[ind].active_tb:
-                    tb_strain = ['ds', 'mdr'][int(np.random.binomial(n=1, p=self.params['init_mdr_perc']/100.))]
-                    self.infect_an_individual(ind, strain=tb_strain)
+                    is_mdr = int(np.random.binomial(n=1, p=self.params['init_mdr_perc']/100.))
+                    self.infect_an_individual(ind, strain=[population.DS, population.MDR][is_mdr])
                     self.ltbi_prevalence += 1
 
     def get_other_household_members(self, ind_id):
@@ -467,35 +519,44 @@ class Model:
          self.eligible_hh_for_birth is updated
         :return: nothing
         """
-        self.eligible_hh_for_birth = {}
-        for h in self.households.values():
-            if (self.time - h.repopulate_date) < 365.25 * self.params['duration_hh_eligible_for_birth'] and \
-                    h.size > 0 and (self.time - h.last_baby_time) > h.minimum_time_to_next_baby:
-                self.eligible_hh_for_birth[h.id] = h.size
+        self.eligible_hh_for_birth = sampling.WeightedSampler(
+            [(h.id, 1. / h.size) for h in self.households.values() if
+             (self.time - h.repopulate_date) < 365.25 * self.params['duration_hh_eligible_for_birth'] and
+             h.size > 0 and (self.time - h.last_baby_time) > h.minimum_time_to_next_baby])
 
-    def pick_eligible_household_for_birth(self):
+    def update_weight_for_birth(self, hh_id):
         """
-        This method will randomly pick an eligible household among the ones listed in self.eligible_hh_for_birth.
-        The hosuehold of small size will be favored
-        :return: a household id
+        The size of household hh_id has decreased. Update its weight in self.eligible_hh_for_birth if it is eligible.
+        Households that have become empty are no longer eligible.
         """
-        if len(self.eligible_hh_for_birth) > 0:
-            hh_ids = self.eligible_hh_for_birth.keys()
-            hh_sizes = self.eligible_hh_for_birth.values()
-
-            probas = [1./float(x) for x in hh_sizes]
-            probas = [x / sum(probas) for x in probas]
-
-            draw = np.random.multinomial(1, probas)
-            index = int(np.nonzero(draw)[0])
-            hh_id = hh_ids[index]
-        else:
-            hh_size = 0
-            while hh_size == 0:
-                hh_id = np.random.choice(self.households.keys(), 1)[0]
-                hh_size = self.households[hh_id].size
+        if hh_id in self.eligible_hh_for_birth:
+            if self.households[hh_id].size > 0:
+                self.eligible_hh_for_birth[hh_id] = 1. / self.households[hh_id].size
+            else:
+                del self.eligible_hh_for_birth[hh_id]
+
+    def pick_eligible_households_for_birth(self, nb_births):
+        """
+        This method will randomly pick nb_births eligible households among the ones listed in
+        self.eligible_hh_for_birth. The households of small size will be favored. A household can only be picked once as
+        it is no longer eligible after receiving a newborn. When no eligible household remains, non-empty households are
+        picked at random.
+        :return: a list of household ids
+        """
+        hh_ids = []
+        uniform_draws = np.random.random_sample(nb_births)
+        for i in range(nb_births):
+            if len(self.eligible_hh_for_birth) > 0:
+                hh_id = self.eligible_hh_for_birth.sample(uniform_draws[i])
+                del self.eligible_hh_for_birth[hh_id]
+            else:
+                hh_size = 0
+                while hh_size == 0:
+                    hh_id = np.random.choice(self.households.keys(), 1)[0]
+                    hh_size = self.households[hh_id].size
+            hh_ids.append(hh_id)
 
-        return hh_id
+        return hh_ids
 
     def lighten_want_to_move_home(self):
         """
@@ -504,42 +565,32 @@ class Model:
         """
         # If an individual has been waiting for a new home for more that 1 year, we allow birth to happen in his/her
         # household
-        updates_ind_ids = []
-        for ind_id, time in self.individuals_want_to_move.iteritems():
-            if self.time - time > 365.25:
-                h = self.households[self.individuals[ind_id].household_id]
-                if h.size > 0:
-                    # Allow birth to happen
-                    h.repopulate_date = self.time
-                    self.eligible_hh_for_birth[h.id] = h.size
-                updates_ind_ids.append(ind_id)
-
-        # clean self.individuals_want_to_move dictionary
-        for ind_id in updates_ind_ids:
-            del(self.individuals_want_to_move[ind_id])
-
-    def run(self):
+        # the queue is sorted by entry time so the individuals concerned are at the front of the queue
+        while len(self.individuals_want_to_move) > 0 and self.time - self.individuals_want_to_move.peek()[1] > 365.25:
+            ind_id = self.individuals_want_to_move.pop()
+            h = self.households[self.individuals[ind_id].household_id]
+            if h.size > 0:
+                # Allow birth to happen
+                h.repopulate_date = self.time
+                self.eligible_hh_for_birth[h.id] = 1. / h.size
+
+    def run(self, n_iterations=None):
         """
         run the initialised model for n_iterations time-steps (weeks)
+        n_iterations: number of time-steps, defaults to params['n_iterations']. Used to complete the burn-in periods
+        after the demographic burn-in.
         """
-        self.status_file_created = False
-        # If the model is already initialised, we need to update the number of iterations
-        if self.initialised:
-            self.process_n_iterations()
+        if n_iterations is None:
+            self.status_file_created = False
+            # If the model is already initialised, we need to update the number of iterations
+            if self.initialised:
+                self.process_n_iterations()
+            n_iterations = self.params['n_iterations']
 
         if self.params['force_tb_init']:
             self.tb_has_started = False  # the tb initialisation process will happen in any case
 
-        for i in range(self.params['n_iterations']):
-
-            if self.time >= self.time_reset_records and not self.records_have_been_reset:
-                self.reset_recording_attributes()
-                self.records_have_been_reset = True
-            self.move_forward()
-            if self.params['stop_if_condition'] and not self.stopped_simulation:
-                stop = self.shall_we_stop()
-                if stop:
-                    self.stop_running_model()
+        self.run_iterations(n_iterations)
 
         if not self.ltbi_age_stats_have_been_recorded:
             self.record_ltbi_ages()
@@ -574,6 +625,17 @@ class Model:
                 new_file_path = os.path.join(dir_path, 'complete_seed' + str(self.i_seed) + '_' + self.scenario + '_run' + str(self.i_run) + '.txt')
                 os.rename(file_path, new_file_path)
 
+    def run_iterations(self, n_iterations):
+        for i in range(n_iterations):
+            if self.time >= self.time_reset_records and not self.records_have_been_reset:
+                self.reset_recording_attributes()
+                self.records_have_been_reset = True
+            self.move_forward()
+            if self.params['stop_if_condition'] and not self.stopped_simulation:
+                stop = self.shall_we_stop()
+                if stop:
+                    self.stop_running_model()
+
     def move_forward(self):
         if self.params['run_universal_methods']:
             self.run_universal_methods()  # what needs to be done for every single individual at every step
@@ -664,7 +726,9 @@ class Model:
             # demo only again
             self.trigger_programmed_deaths()
 
-            if not self.fertility_replacement:
+            if self.fertility_replacement:
+                self.trigger_replacement_births()
+            else:
                 self.trigger_births()
 
             self.update_want_to_move_list()
@@ -689,7 +753,7 @@ class Model:
         if self.timeseries_log['tb_prevalence'][-1] >= self.params['prevalence_max']:
             stop = True
             print "Model run will be forced to stop because tb prevalence is too high."
-        if self.tb_prevalence == 0 and len(self.programmed_events['activation'].values()) == 0 and self.time > 365.25*(
+        if self.tb_prevalence == 0 and not self.programmed_events.has_pending('activation') and self.time > 365.25*(
             self.params['duration_burning_demo'] + self.params['duration_burning_tb'] + 1.) and self.params['transmission']:
             stop = True
             print "Model run will be forced to stop because there is no more TB."
@@ -700,23 +764,12 @@ class Model:
 
     def run_universal_methods(self):
         """
-        Measures and/or actions that have to be performed for every single individual in the system.
-        Grouping these methods in a same loop allows us to save computing time.
+        Measures that have to be performed over every single individual in the system. They are computed from the
+        population columns in a single vectorised pass.
         """
-        # initialisation of the different variables
-        self.mean_age = 0.
-        self.prop_under_5 = 0.
-
-        # loop through all individuals
-        for ind_id, ind in self.individuals.iteritems():
-            age = ind.get_age_in_years(self.time)
-            self.mean_age += age
-            if age < 5.:
-                self.prop_under_5 += 1.
-
-        # post-loop treatment of the variables
-        self.mean_age /= self.population
-        self.prop_under_5 /= self.population
+        ages = self.population_data.get_ages_in_years(self.population_data.alive_ids(), self.time)
+        self.mean_age = ages.sum() / self.population
+        self.prop_under_5 = np.count_nonzero(ages < 5.) / float(self.population)
 
     def run_yearly_methods(self):
         """
@@ -732,8 +785,6 @@ class Model:
 
         self.lighten_want_to_move_home()
 
-        self.update_ind_by_agegroup()
-
     def store_variables(self):
         """
         Populate dictionaries that store the model outputs
@@ -808,21 +859,51 @@ class Model:
         self.n_pt_provided = 0.
         self.n_useful_pt_provided = 0.
 
-    def set_birth_and_death(self, ind_id, age):
-        """
-        update the dOB and dOD attributes of the individual ind_id, given a current age
-        """
-        self.individuals[ind_id].set_dOB(age, self.time, self.params['time_step'])
-        self.individuals[ind_id].set_death_date(np.random.choice(self.pool_of_life_durations, 1)[0])
-        self.add_event_to_programmed_events('death', ind_id)
+    def set_births_and_deaths(self, ind_ids, ages):
+        """
+        Update the dOB and dOD of the individuals listed in the array ind_ids, given their current ages (array ages),
+        and draw their vaccination status and school and work details. The programmed events are stored in the
+        population columns and scheduled in bulk.
+        """
+        n = len(ind_ids)
+        population_data = self.population_data
+        dOBs = self.time - np.round(ages * 365.25)
+        newborns = ages == 0.
+        dOBs[newborns] = self.time - np.round(np.random.uniform(low=0., high=self.params['time_step'],
+                                                                size=newborns.sum()))
+        population_data.dOB[ind_ids] = dOBs
+
+        programmed_dates = {}
+        death_dates = dOBs + np.round(np.random.choice(self.pool_of_life_durations, n) * 365.25)
+        past_deaths = death_dates <= 0.
+        death_dates[past_deaths] = np.random.randint(0, 10. * 365.25, past_deaths.sum())
+        programmed_dates['death'] = death_dates
         if self.time > 0:
-            self.individuals[ind_id].set_date_leaving_home(params=self.params)
-            self.add_event_to_programmed_events('leave_home', ind_id)
-
-        self.individuals[ind_id].assign_vaccination_status(self.scale_up_functions_current_time['bcg_coverage_prop'])
-        self.individuals[ind_id].set_school_and_work_details(self.params)
-        self.update_school_and_work_programs(ind_id)
-        self.dates_of_birth[ind_id] = self.individuals[ind_id].dOB
+            programmed_dates['leave_home'] = np.round(dOBs + 365.25 * np.random.uniform(
+                self.params['minimal_age_leave_hh'], self.params['maximal_age_leave_hh'], n))
+
+        population_data.vaccinated[ind_ids] = \
+            np.random.random_sample(n) < self.scale_up_functions_current_time['bcg_coverage_prop']
+
+        # school and work details
+        programmed_dates['go_to_school'] = dOBs + np.round(self.params['school_age'] * 365.25 +
+                                                          np.random.uniform(-1., 1., n) * 365.25)
+        programmed_dates['leave_school'] = dOBs + np.round(self.params['active_age_low'] * 365.25 +
+                                                          np.random.uniform(-3., 3., n) * 365.25)
+        leave_work_dates = dOBs + np.round(np.random.uniform(55., 70., n) * 365.25)
+        is_ever_gonna_work = np.random.random_sample(n) < self.params['perc_active'] / 100.
+        population_data.is_ever_gonna_work[ind_ids] = is_ever_gonna_work
+        programmed_dates['leave_work'] = leave_work_dates
+
+        for event_type, dates in programmed_dates.iteritems():
+            population_data.programmed[event_type][ind_ids] = dates
+            if event_type == 'leave_work':  # only scheduled for the individuals who will ever work
+                dates, scheduled_ids = dates[is_ever_gonna_work], ind_ids[is_ever_gonna_work]
+            else:
+                scheduled_ids = ind_ids
+            handles = self.programmed_events.schedule_many(event_type, dates.tolist(), scheduled_ids.tolist())
+            for ind_id, handle in zip(scheduled_ids.tolist(), handles):
+                self.individuals[ind_id].event_handles[event_type] = handle
 
     def add_event_to_programmed_events(self, event_type, ind_id):
         """
@@ -833,10 +914,23 @@ class Model:
         event_type_individual = event_type
         if event_type == 'tb_death':
             event_type_individual = 'death'
-        if self.individuals[ind_id].programmed[event_type_individual] in self.programmed_events[event_type].keys():
-            self.programmed_events[event_type][self.individuals[ind_id].programmed[event_type_individual]].append(ind_id)
-        else:
-            self.programmed_events[event_type][self.individuals[ind_id].programmed[event_type_individual]] = [ind_id]
+        self.schedule_event(event_type, self.individuals[ind_id].programmed[event_type_individual], ind_id)
+
+    def schedule_event(self, event_type, date, ind_id):
+        """
+        Programme an event for individual ind_id. The event handle is kept by the individual so that the event can be
+        cancelled in O(1). Any event of the same type previously programmed for the individual is cancelled.
+        """
+        self.cancel_event(event_type, ind_id)
+        self.individuals[ind_id].event_handles[event_type] = self.programmed_events.schedule(event_type, date, ind_id)
+
+    def cancel_event(self, event_type, ind_id):
+        """
+        Cancel the event of type event_type programmed for individual ind_id, if any.
+        """
+        handle = self.individuals[ind_id].event_handles.pop(event_type, None)
+        if handle is not None:
+            self.programmed_events.cancel(handle)
 
     def build_or_destroy_households(self):
         """
@@ -849,11 +943,11 @@ class Model:
         if current_n_hh > ideal_nb_hh and len(self.empty_households) > 0:  # we need to remove households so we try to remove some empty ones.
             nb_households_modified = True
             n_hh_to_remove = current_n_hh - ideal_nb_hh
-            hh_ids_to_remove = [hh_id for i, hh_id in enumerate(self.empty_households) if i+1 <= n_hh_to_remove]
+            hh_ids_to_remove = list(islice(self.empty_households, n_hh_to_remove))
             for hh_id in hh_ids_to_remove:
-                if hh_id in self.eligible_hh_for_birth.keys():
+                if hh_id in self.eligible_hh_for_birth:
                     del self.eligible_hh_for_birth[hh_id]
-                self.empty_households = [hh for hh in self.empty_households if hh != hh_id]
+                self.empty_households.discard(hh_id)
                 del self.households[hh_id]
                 self.n_households -= 1
         elif current_n_hh < ideal_nb_hh:  # we need to build new households
@@ -862,7 +956,7 @@ class Model:
             for _ in range(nb_hh_to_build):
                 new_hh_id = max(self.households.keys()) + 1
                 self.households[new_hh_id] = household.household(id=new_hh_id)
-                self.empty_households.append(new_hh_id)
+                self.empty_households.add(new_hh_id)
                 self.households[new_hh_id].school_id = np.random.choice(self.groups_by_type['schools'], 1)[0]
                 self.n_households += 1
 
@@ -875,10 +969,8 @@ class Model:
         dictionary accordingly.
          This method does not make individuals move home. It only add them to a queue.
         """
-        for leave_home_time in [d for d in self.programmed_events['leave_home'].keys() if d <= self.time]:
-            for ind_id in self.programmed_events['leave_home'][leave_home_time]:
-                self.individuals_want_to_move[ind_id] = self.time
-            del self.programmed_events['leave_home'][leave_home_time]
+        for ind_id in self.programmed_events.pop_due('leave_home', self.time):
+            self.individuals_want_to_move.add(ind_id, self.time)
 
     def trigger_individuals_move_home(self):
         """
@@ -887,12 +979,9 @@ class Model:
         """
 
         while len(self.individuals_want_to_move) > 1 and len(self.empty_households) > 0:
-            ind_id_1 = min(self.individuals_want_to_move, key=self.individuals_want_to_move.get)
-            del(self.individuals_want_to_move[ind_id_1])
-            ind_id_2 = min(self.individuals_want_to_move, key=self.individuals_want_to_move.get)
-            del (self.individuals_want_to_move[ind_id_2])
-            self.make_couple_move_to_household(ind_ids=[ind_id_1, ind_id_2], hh_id=self.empty_households[0])
-            del(self.empty_households[0])
+            ind_id_1 = self.individuals_want_to_move.pop()
+            ind_id_2 = self.individuals_want_to_move.pop()
+            self.make_couple_move_to_household(ind_ids=[ind_id_1, ind_id_2], hh_id=self.empty_households.pop_first())
 
     def make_couple_move_to_household(self, ind_ids, hh_id):
         """
@@ -907,8 +996,9 @@ class Model:
             self.households[prev_hh_id].size -= 1
             self.households[prev_hh_id].individual_ids = [i for i in self.households[prev_hh_id].individual_ids
                                                           if i != ind_id]
+            self.update_weight_for_birth(prev_hh_id)
             if self.households[prev_hh_id].size == 0:
-                self.empty_households.append(prev_hh_id)
+                self.empty_households.add(prev_hh_id)
 
             # update individual's attributes
             self.individuals[ind_id].household_id = hh_id
@@ -935,7 +1025,7 @@ class Model:
         screened_ind_ids = self.pick_screened_individuals()
         for ind_id in screened_ind_ids:
             # screening
-            test_result = self.individuals[ind_id].test_individual_for_ltbi(self.params)
+            test_result = self.individuals[ind_id].test_individual_for_ltbi(self.params, self.random_streams)
 
             # treatment
             if test_result:
@@ -944,50 +1034,24 @@ class Model:
     def pick_screened_individuals(self):
         """
         Creates a list of individual ids that are provided with screening for LTBI through the mass program.
-        This program may be targeted at a specific subgroup.
+        This program may be targeted at a specific subgroup ("children", "young_children" or "adult"). The individuals
+        are drawn directly from the age index.
         return: a list of ids
         """
         n_screened_individuals = int(round((self.params['mass_pt_screening_rate'] / 100.) * self.population \
                                        * self.params['time_step'] / 365.25))
-        if self.params['subgroup_for_mass_pt'] == 'all':  # screening applies to all
-            screened_individuals = np.random.choice(self.individuals.keys(), n_screened_individuals, replace=False)
-        else:   # screening applies to specific groups
-            ind_ids = range(int(self.population))
-            np.random.shuffle(ind_ids)
-            n_recorded = 0
-            n_tried = 0
-            screened_individuals = []
-            while n_recorded < n_screened_individuals:
-                ind_id = ind_ids[n_tried]
-                if self.individuals[ind_id].is_in_subgroup(subgroup=self.params['subgroup_for_mass_pt'], time=self.time):
-                    screened_individuals.append(ind_id)
-                    n_recorded += 1
-                n_tried += 1
-                if n_tried == self.population + 1:
-                    print "Could not find enough individuals to screen!"
-                    exit('Program stopped')
-
-        return screened_individuals
-
-    def update_school_and_work_programs(self, ind_id):
-        """
-        Update the programmed_go_to_school programmed_leave_school and programmed_leave_work dictionaries.
-        """
-        keys_to_loop = ['go_to_school', 'leave_school']
-        if self.individuals[ind_id].is_ever_gonna_work:
-            keys_to_loop.append('leave_work')
+        age_min, age_max = age_index.get_subgroup_age_limits(self.params['subgroup_for_mass_pt'])
+        screened_individuals = self.age_index.sample_ids(age_min, age_max, self.time, n_screened_individuals,
+                                                         np.random.random_sample(n_screened_individuals))
+        if screened_individuals is None:
+            print "Could not find enough individuals to screen!"
+            exit('Program stopped')
 
-        for key in keys_to_loop:
-            if self.individuals[ind_id].programmed[key] in self.programmed_events[key].keys():
-                self.programmed_events[key][self.individuals[ind_id].programmed[key]].append(ind_id)
-            else:
-                self.programmed_events[key][self.individuals[ind_id].programmed[key]] = [ind_id]
+        return screened_individuals.tolist()
 
     def trigger_programmed_go_to_school(self):
-        for go_to_school_time in [d for d in self.programmed_events['go_to_school'].keys() if d <= self.time]:
-            for ind_id in self.programmed_events['go_to_school'][go_to_school_time]:
-                self.make_individual_go_to_school(ind_id)
-            del self.programmed_events['go_to_school'][go_to_school_time]
+        for ind_id in self.programmed_events.pop_due('go_to_school', self.time):
+            self.make_individual_go_to_school(ind_id)
 
     def make_individual_go_to_school(self, ind_id):
         # identify the group id
@@ -995,10 +1059,8 @@ class Model:
         self.make_individual_enter_group(ind_id, group_id)
 
     def trigger_programmed_leave_school(self):
-        for leave_school_time in [d for d in self.programmed_events['leave_school'].keys() if d <= self.time]:
-            for ind_id in self.programmed_events['leave_school'][leave_school_time]:
-                self.make_individual_leave_school(ind_id)
-            del self.programmed_events['leave_school'][leave_school_time]
+        for ind_id in self.programmed_events.pop_due('leave_school', self.time):
+            self.make_individual_leave_school(ind_id)
 
     def make_individual_leave_school(self, ind_id):
         for g_id in self.individuals[ind_id].group_ids:
@@ -1014,10 +1076,8 @@ class Model:
         self.make_individual_enter_group(ind_id, group_id)
 
     def trigger_programmed_leave_work(self):
-        for leave_work_time in [d for d in self.programmed_events['leave_work'].keys() if d <= self.time]:
-            for ind_id in self.programmed_events['leave_work'][leave_work_time]:
-                self.make_individual_leave_work(ind_id)
-            del self.programmed_events['leave_work'][leave_work_time]
+        for ind_id in self.programmed_events.pop_due('leave_work', self.time):
+            self.make_individual_leave_work(ind_id)
 
     def make_individual_leave_work(self, ind_id):
         group_id = self.individuals[ind_id].group_ids[0]
@@ -1028,36 +1088,34 @@ class Model:
         Make individual "ind_id" enter the group "group_id"
         """
         self.individuals[ind_id].group_ids.append(group_id)
-        self.groups[group_id].append(ind_id)
+        self.groups[group_id].add(ind_id)
 
     def make_individual_leave_group(self, ind_id, group_id):
         """
         Make individual "ind_id" leave the group "group_id"
         """
-        self.individuals[ind_id].group_ids = [gr_id for gr_id in self.individuals[ind_id].group_ids if gr_id != group_id]
-        self.groups[group_id] = [ids for ids in self.groups[group_id] if ids != ind_id]
+        self.individuals[ind_id].group_ids.remove(group_id)
+        self.groups[group_id].remove(ind_id)
 
     def trigger_programmed_activations(self):
         """
-        The individuals listed in the programmed_events['activation'] dictionary for the times elapsed since the last iteration time
+        The individuals programmed to activate TB for the times elapsed since the last iteration time
         have to activate TB.
         """
-        for activation_time in [d for d in self.programmed_events['activation'].keys() if d <= self.time]:
-            for ind_id in self.programmed_events['activation'][activation_time]:
-                self.make_individual_activate_tb(ind_id)
-            del self.programmed_events['activation'][activation_time]
+        for ind_id in self.programmed_events.pop_due('activation', self.time):
+            self.make_individual_activate_tb(ind_id)
 
     def make_individual_activate_tb(self, ind_id, init=False):
         """
         Triggers activation in the individual ind_id by changing the relevant attribute and updating the "active_cases"
-        dictionary.
+        and "infectious_cases" sets.
         """
         if self.individuals[ind_id].ltbi:  # may be ltbi-neg if pt has been used with delay or if initialisation of TB states.
             self.ltbi_prevalence -= 1
-        self.active_cases.append(ind_id)
+        self.active_cases.add(ind_id)
         self.individuals[ind_id].activate_tb()
         self.tb_prevalence += 1
-        if self.individuals[ind_id].tb_strain == 'ds':
+        if self.individuals[ind_id].tb_strain_code == population.DS:
             self.tb_prevalence_ds += 1
         else:
             self.tb_prevalence_mdr += 1
@@ -1065,7 +1123,10 @@ class Model:
         self.tb_incidence += 1
 
         tb_outcome = self.individuals[ind_id].define_tb_outcome(time=self.time, params=self.params,
-                                                                tx_success_prop=self.scale_up_functions_current_time['treatment_success_prop'])
+                                                                tx_success_prop=self.scale_up_functions_current_time['treatment_success_prop'],
+                                                                random_streams=self.random_streams)
+        if self.individuals[ind_id].tb_organ_code != population.EXTRAPULMONARY:
+            self.infectious_cases.add(ind_id)
         if 'time_active' in tb_outcome.keys():
             self.time_active['total_n_cases'] += 1
             self.time_active['total_time_active'] += tb_outcome['time_active']
@@ -1080,46 +1141,60 @@ class Model:
             self.all_tb_ages.append(self.individuals[ind_id].get_age_in_years(self.time))
 
     def record_all_contacts(self):
+        """
+        Record the daily contacts of a random sample of the population in self.contact_matrices['contact']. The
+        contacts of all the sampled individuals are gathered into flat arrays before being added to the matrices.
+        """
         if self.stopped_simulation:
             return
 
         print "Start recording contact patterns"
 
-        n_recorded_index = int(ceil(self.population * self.params['perc_sampled_for_contacts'] / 100.))
-        recorded_ind_ids = np.random.choice(self.individuals.keys(), n_recorded_index, replace=False)
+        alive_ids = self.population_data.alive_ids()
+        n_recorded_index = min(int(ceil(self.population * self.params['perc_sampled_for_contacts'] / 100.)),
+                               len(alive_ids))
+        recorded_ind_ids = alive_ids[sampling.sample_without_replacement(len(alive_ids), n_recorded_index,
+                                                                         np.random.random_sample(n_recorded_index))]
 
         # initialisation
         for location in self.contact_matrices['contact'].keys():
             self.contact_matrices['contact'][location] = np.zeros((101, 101))  # null matrix 100x100
             self.n_contacts['contact'][location] = 0
 
-        for i, ind_id in enumerate(recorded_ind_ids):
-            contact_dict = self.get_contacts_during_last_step(ind_id, infectious_only=False)
-            self.update_contact_matrices(ind_id, contact_dict)
-
-            # count contacts
-            for location in self.n_contacts['contact'].keys():
-                self.n_contacts['contact'][location] += sum(contact_dict[location].values())
-
-            if os.name == 'nt':  # only on local windows machine
-                perc_completion = int(round(100*(i+1)/n_recorded_index, 0))
-                dynamic_string = str(perc_completion) + "% of contacts recorded."
-                stdout.write("\r\x1b[K" + dynamic_string.__str__())
-                stdout.flush()
+        # contacts of all the sampled individuals at once, recorded over one day
+        recording_durations = np.ones(n_recorded_index)
+        network_positions, network_contact_ids, network_nb_contacts, network_location_indices = \
+            self.draw_network_contacts(recorded_ind_ids, recording_durations, infectious_only=False)
+        index_ids = [recorded_ind_ids[network_positions]]
+        contact_ids = [network_contact_ids]
+        location_indices = [network_location_indices]
+        nb_contacts = [network_nb_contacts]
+
+        positions, hh_contact_ids, hh_nb_contacts = self.draw_household_contacts(recorded_ind_ids, recording_durations,
+                                                                                 infectious_only=False)
+        community_positions, community_contact_ids = self.draw_community_contacts(recorded_ind_ids, recording_durations,
+                                                                                  infectious_only=False)
+        for location, location_positions, location_contact_ids, location_nb_contacts in \
+                [('household', positions, hh_contact_ids, hh_nb_contacts),
+                 ('community', community_positions, community_contact_ids, np.ones(len(community_contact_ids)))]:
+            index_ids.append(recorded_ind_ids[location_positions])
+            contact_ids.append(location_contact_ids)
+            location_indices.append(np.full(len(location_contact_ids), self.locations.index(location), dtype=int))
+            nb_contacts.append(location_nb_contacts)
+
+        self.add_to_contact_matrices('contact', np.concatenate(index_ids), np.concatenate(contact_ids),
+                                     np.concatenate(location_indices), np.concatenate(nb_contacts))
+        print "Contact patterns recorded for " + str(n_recorded_index) + " individuals"
         # # rescale the contact matrices
         # for contact_type in self.contact_matrices.keys():
         #     self.contact_matrices[contact_type] /= n_contacts
 
-    def get_contacts_during_last_step(self, ind_id, infectious_only=True):
+    def get_recording_duration(self, ind_id, infectious_only=True):
         """
-        Generate contacts between ind_id and other individuals of the whole population.
         If infectious_only is True, only the infectiousness period of ind_id intercepted with the last time step
         is considered. If not, the full time step is considered
-        return: a dicitonary {id1: nb_contacts1, id2: nb_contacts2}
+        return: the nb of days during which the contacts of ind_id are recorded
         """
-        contact_dict = {}
-        for location in self.contact_matrices['contact'].keys():
-            contact_dict[location] = {}
         if infectious_only:
             start_recording = max(self.individuals[ind_id].programmed['activation'], self.time - self.params['time_step'])
             if 'recovery' not in self.individuals[ind_id].programmed.keys():
@@ -1127,20 +1202,35 @@ class Model:
             else:
                 end_recording = min(self.individuals[ind_id].programmed['recovery'], self.individuals[ind_id].programmed['death'],
                                          self.time)
-            recording_duration = max(end_recording - start_recording, 0)
+            return max(end_recording - start_recording, 0)
         else:
-            recording_duration = 1.  # we want to display daily contacts
+            return 1.  # we want to display daily contacts
+
+    def get_contacts_during_last_step(self, ind_id, infectious_only=True, community_thinning_proba=1.,
+                                      include_household=True):
+        """
+        Generate contacts between ind_id and other individuals of the whole population.
+        If infectious_only is True, only the infectiousness period of ind_id intercepted with the last time step
+        is considered. If not, the full time step is considered
+        community_thinning_proba is passed to get_community_contacts
+        include_household is False when the household contacts are drawn separately (see draw_household_contacts)
+        return: a dicitonary {id1: nb_contacts1, id2: nb_contacts2}
+        """
+        contact_dict = {}
+        for location in self.contact_matrices['contact'].keys():
+            contact_dict[location] = {}
+        recording_duration = self.get_recording_duration(ind_id, infectious_only)
 
         if recording_duration > 0:
-            contact_dict['household'] = self.get_household_contacts(ind_id, recording_duration, infectious_only)
-            contact_dict['community'] = self.get_community_contacts(ind_id, recording_duration, infectious_only)
+            if include_household:
+                contact_dict['household'] = self.get_household_contacts(ind_id, recording_duration, infectious_only)
+            contact_dict['community'] = self.get_community_contacts(ind_id, recording_duration, infectious_only,
+                                                                    community_thinning_proba)
 
             # does ind_id attend a group?
             if len(self.individuals[ind_id].group_ids) > 0:
-                group_id = self.individuals[ind_id].group_ids[0]
-                group_type = self.group_types[group_id]
-                contact_dict[group_type] = self.get_network_contacts(ind_id, recording_duration, group_id=group_id,
-                                                                     group_type=group_type, infectious_only=infectious_only)
+                group_type = self.group_types[self.individuals[ind_id].group_ids[0]]
+                contact_dict[group_type] = self.get_network_contacts(ind_id, recording_duration, infectious_only)
         return contact_dict
 
     def get_household_contacts(self, ind_id, recording_duration, infectious_only=True):
@@ -1149,82 +1239,179 @@ class Model:
         during which contacts are recorded.
         return: a dictionary {id1: nb_contacts1, id2: nb_contacts2}
         """
-        household_contacts = {}
-        if self.households[self.individuals[ind_id].household_id].size > 1:
-            contact_ids = self.get_other_household_members(ind_id)
-            for c_id in contact_ids:
-                # we assume that everyone living with ind_id contact ind_id once a day
-                nb_contacts = np.random.binomial(recording_duration, self.params['perc_hh_contacted']/100.)
-                if nb_contacts > 0:
-                    household_contacts[c_id] = nb_contacts
-                    if self.params['contact_tracing_pt_program'] and infectious_only:
-                        self.individuals[ind_id].contacts_while_tb['household'].add(c_id)
-        return household_contacts
-
-    def get_network_contacts(self, ind_id, recording_duration, group_id, group_type, infectious_only=True):
-        """
-        Generate contacts between ind_id and people from the same group (school or workplace).
+        _, contact_ids, nb_contacts = self.draw_household_contacts(np.array([ind_id]), np.array([recording_duration]),
+                                                                   infectious_only)
+        return dict(zip(contact_ids.tolist(), nb_contacts.tolist()))
+
+    def draw_household_contacts(self, index_ids, recording_durations, infectious_only=True):
+        """
+        Generate the household contacts of all the individuals listed in the array index_ids at once. The members of
+        their households are gathered into flat arrays and the nb of contacts with each member is drawn in one call.
+        recording_durations is the array of the nb of days during which the contacts of each individual are recorded.
+        return: three arrays of the same length listing the positions of the index cases in index_ids, the contact ids
+            and the nb of contacts
+        """
+        household_members = [self.households[self.individuals[ind_id].household_id].individual_ids for ind_id in
+                             index_ids.tolist()]
+        sizes = np.array([len(member_ids) for member_ids in household_members], dtype=int)
+        member_ids = np.fromiter(chain.from_iterable(household_members), dtype=int, count=sizes.sum())
+        index_positions = np.repeat(np.arange(len(index_ids)), sizes)
+        is_other_member = member_ids != index_ids[index_positions]
+        index_positions = index_positions[is_other_member]
+        member_ids = member_ids[is_other_member]
+
+        # we assume that everyone living with an index case contacts the index case once a day
+        nb_contacts = np.random.binomial(recording_durations[index_positions].astype(int),
+                                         self.params['perc_hh_contacted'] / 100.)
+        contacted = nb_contacts > 0
+        index_positions = index_positions[contacted]
+        contact_ids = member_ids[contacted]
+        if self.params['contact_tracing_pt_program'] and infectious_only:
+            for ind_id, reference in zip(index_ids[index_positions].tolist(),
+                                         self.population_data.get_references(contact_ids)):
+                self.individuals[ind_id].contacts_while_tb['household'].add(reference)
+        return index_positions, contact_ids, nb_contacts[contacted]
+
+    def get_group_age_data(self, group_id):
+        """
+        The member ids and ages of a group are shared by all the infectious cases attending the group during a time
+        step. They are cached until the time changes or the group membership changes.
+        return: (time, membership version, array of member ids, array of member ages)
+        """
+        group = self.groups[group_id]
+        cached = self.group_age_cache.get(group_id)
+        if cached is None or cached[0] != self.time or cached[1] != group.version:
+            member_ids = group.ids.copy()
+            cached = (self.time, group.version, member_ids,
+                      self.population_data.get_ages_in_years(member_ids, self.time))
+            self.group_age_cache[group_id] = cached
+        return cached
+
+    def get_susceptibility_table(self):
+        """
+        return: the tabulated relative susceptibility, rebuilt if the relevant parameters have changed (scenarios)
+        """
+        if self.susceptibility_table is None or not self.susceptibility_table.is_valid_for(self.params):
+            self.susceptibility_table = agent.SusceptibilityTable(self.params)
+        return self.susceptibility_table
+
+    def get_network_contacts(self, ind_id, recording_duration, infectious_only=True):
+        """
+        Generate contacts between ind_id and people from the group (school or workplace) that ind_id attends.
         recording_duration is the nb of days during which contacts are recorded.
-        group_type is either 'school' or 'workplace'
         return: a dictionary {id1: nb_contacts1, id2: nb_contacts2}
         """
-        network_contacts = {}
-        age_ind_id = self.individuals[ind_id].get_age_in_years(self.time)
-        if len(self.groups[group_id]) > 1:
-            if group_type == 'workplace' and self.params['country'] != "None":
-                sigma = self.sd_agepref_work[self.params['country']]
-                total_contact_rate = self.prem_contact_rate_functions['work'](age_ind_id)
-            else:
-                sigma = self.params['sd_agepreference_school']
-                total_contact_rate = self.prem_contact_rate_functions['school'](age_ind_id)
-
-            # calculate f_sigma(x_i,j) for each individual
-            f_sigmas = {}
-            for potential_contact_id in self.groups[group_id]:
-                 if potential_contact_id != ind_id:
-                    age_contact_id = self.individuals[potential_contact_id].get_age_in_years(self.time)
-                    f_sigmas[potential_contact_id] = age_preference_function(age_contact_id - age_ind_id, sigma)
-
-            sum_f_sigmas = sum(f_sigmas.values())
-            raw_proba_of_contact = total_contact_rate / sum_f_sigmas
-            raw_proba_of_contact = (min(raw_proba_of_contact, 1.))
-
-            for potential_contact_id in self.groups[group_id]:
-                if potential_contact_id != ind_id:
-                    nb_contacts = np.random.binomial(recording_duration, f_sigmas[potential_contact_id] *\
-                                                     raw_proba_of_contact)
-                    if nb_contacts > 0:
-                        network_contacts[potential_contact_id] = nb_contacts
-                        if self.params['contact_tracing_pt_program'] and infectious_only:
-                            self.individuals[ind_id].contacts_while_tb[group_type].add(potential_contact_id)
-        return network_contacts
-
-    def get_community_contacts(self, ind_id, recording_duration, infectious_only=True):
+        _, contact_ids, nb_contacts, _ = self.draw_network_contacts(np.array([ind_id]), np.array([recording_duration]),
+                                                                    infectious_only)
+        return dict(zip(contact_ids.tolist(), nb_contacts.tolist()))
+
+    def draw_network_contacts(self, index_ids, recording_durations, infectious_only=True):
+        """
+        Generate the school and workplace contacts of all the individuals listed in the array index_ids at once. The
+        members of the groups attended by the index individuals are gathered into flat arrays so that the age
+        preference kernel and the nb of contacts with each member are evaluated in one call.
+        recording_durations is the array of the nb of days during which the contacts of each individual are recorded.
+        return: four arrays of the same length listing the positions of the index individuals in index_ids, the contact
+            ids, the nb of contacts and the indices of the locations in self.locations
+        """
+        positions, group_types, member_arrays, age_arrays = [], [], [], []
+        for position, ind_id in enumerate(index_ids.tolist()):
+            if len(self.individuals[ind_id].group_ids) > 0:
+                group_id = self.individuals[ind_id].group_ids[0]
+                _, _, member_ids, ages = self.get_group_age_data(group_id)
+                positions.append(position)
+                group_types.append(self.group_types[group_id])
+                member_arrays.append(member_ids)
+                age_arrays.append(ages)
+        if len(positions) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        positions = np.array(positions, dtype=int)
+        index_ages = self.population_data.get_ages_in_years(index_ids[positions], self.time)
+
+        # the workplace kernel and contact rates are only available when a country is specified
+        work_kernel = [group_type == 'workplace' and self.params['country'] != "None" for group_type in group_types]
+        sigmas = np.array([self.sd_agepref_work[self.params['country']] if work else
+                           self.params['sd_agepreference_school'] for work in work_kernel])
+        total_contact_rates = np.array([self.prem_contact_rate_functions['work' if work else 'school'](age)
+                                        for work, age in zip(work_kernel, index_ages.tolist())])
+        location_indices = np.array([self.locations.index(group_type) for group_type in group_types], dtype=int)
+
+        # calculate f_sigma(x_i,j) for each pair of index individual and group member
+        group_positions = np.repeat(np.arange(len(positions)),
+                                    np.array([len(member_ids) for member_ids in member_arrays], dtype=int))
+        member_ids = np.concatenate(member_arrays)
+        member_ages = np.concatenate(age_arrays)
+        is_other_member = member_ids != index_ids[positions[group_positions]]
+        group_positions = group_positions[is_other_member]
+        member_ids = member_ids[is_other_member]
+        f_sigmas = age_preference.age_preference_function(member_ages[is_other_member] - index_ages[group_positions],
+                                                          sigmas[group_positions])
+
+        normalisations = np.bincount(group_positions, weights=f_sigmas, minlength=len(positions))
+        raw_probas_of_contact = np.zeros(len(positions))
+        has_weight = normalisations > 0.
+        raw_probas_of_contact[has_weight] = np.minimum(total_contact_rates[has_weight] / normalisations[has_weight], 1.)
+
+        nb_contacts = np.random.binomial(recording_durations[positions[group_positions]].astype(int),
+                                         f_sigmas * raw_probas_of_contact[group_positions])
+        contacted = nb_contacts > 0
+        group_positions = group_positions[contacted]
+        contact_ids = member_ids[contacted]
+        index_positions = positions[group_positions]
+        if self.params['contact_tracing_pt_program'] and infectious_only:
+            for ind_id, group_position, reference in zip(index_ids[index_positions].tolist(), group_positions.tolist(),
+                                                         self.population_data.get_references(contact_ids)):
+                self.individuals[ind_id].contacts_while_tb[group_types[group_position]].add(reference)
+        return index_positions, contact_ids, nb_contacts[contacted], location_indices[group_positions]
+
+    def get_community_contacts(self, ind_id, recording_duration, infectious_only=True, thinning_proba=1.):
         """
         Generate contacts between ind_id and random people from the community.
+        When thinning_proba is lower than 1, each contact is only kept with probability thinning_proba, which amounts to
+        drawing from contact rates multiplied by thinning_proba (see get_community_thinning_proba).
         return: a dictionary {id1: nb_contacts1, id2: nb_contacts2}
         """
-        community_contacts = {}
-        age_ind_id = self.individuals[ind_id].get_age_in_years(self.time)
-        Prem_col_index = min(int(floor(age_ind_id / 5.)), 15)
-        contact_rates = self.contact_rates_matrices['other_locations'][Prem_col_index, :] * recording_duration
-        nb_of_contacts_to_draw = np.random.poisson(lam=contact_rates)  # nb of contacts per age category
-
-        for i in range(16):
-            if nb_of_contacts_to_draw[i] > 0.:
-                age_cat = "X_" + str(i + 1)
-                if len(self.ind_by_agegroup[age_cat]) <= nb_of_contacts_to_draw[i]:
-                    contact_ids = self.ind_by_agegroup[age_cat]
-                else:
-                    contact_ids = np.random.choice(self.ind_by_agegroup[age_cat], size=nb_of_contacts_to_draw[i],
-                                                   replace=False)
-                for contact_id in contact_ids:
-                    if contact_id != ind_id:
-                        community_contacts[contact_id] = 1  # we assume a single contact
-                        if self.params['contact_tracing_pt_program'] and infectious_only:
-                            self.individuals[ind_id].contacts_while_tb['community'].add(contact_id)
-
-        return community_contacts
+        _, contact_ids = self.draw_community_contacts(np.array([ind_id]), np.array([recording_duration]),
+                                                      infectious_only, thinning_proba)
+        return dict.fromkeys(contact_ids.tolist(), 1)  # we assume a single contact
+
+    def draw_community_contacts(self, index_ids, recording_durations, infectious_only=True, thinning_proba=1.):
+        """
+        Generate the community contacts of all the individuals listed in the array index_ids at once. The nb of
+        contacts with each Prem age category is drawn in one call for all the individuals, then the contacts are
+        picked at random in the age categories using the cohort counts of the age index, without collecting the ids of
+        the age categories.
+        recording_durations is the array of the nb of days during which the contacts of each individual are recorded.
+        return: two arrays of the same length listing the positions of the index individuals in index_ids and the
+            contact ids. Each contact is a single contact.
+        """
+        ages = self.population_data.get_ages_in_years(index_ids, self.time)
+        Prem_col_indices = np.minimum(np.floor(ages / 5.).astype(int), 15)
+        contact_rates = self.contact_rates_matrices['other_locations'][Prem_col_indices, :] *\
+            (recording_durations * thinning_proba)[:, np.newaxis]
+        nb_of_contacts_to_draw = np.random.poisson(lam=contact_rates)  # nb of contacts per individual and age category
+        uniform_draws = np.random.random_sample(nb_of_contacts_to_draw.sum())
+
+        index_positions, contact_ids = [], []
+        i_draw = 0
+        for position, i in zip(*[indices.tolist() for indices in np.nonzero(nb_of_contacts_to_draw)]):
+            n = nb_of_contacts_to_draw[position, i]
+            agegroup_contact_ids = self.age_index.sample_prem_agegroup_ids(i, self.time, n,
+                                                                           uniform_draws[i_draw:i_draw + n])
+            i_draw += n
+            index_positions.extend([position] * len(agegroup_contact_ids))
+            contact_ids.extend(agegroup_contact_ids)
+        index_positions = np.array(index_positions, dtype=int)
+        contact_ids = np.array(contact_ids, dtype=int)
+
+        is_other = contact_ids != index_ids[index_positions]
+        index_positions = index_positions[is_other]
+        contact_ids = contact_ids[is_other]
+        if self.params['contact_tracing_pt_program'] and infectious_only:
+            for ind_id, reference in zip(index_ids[index_positions].tolist(),
+                                         self.population_data.get_references(contact_ids)):
+                self.individuals[ind_id].contacts_while_tb['community'].add(reference)
+        return index_positions, contact_ids
 
     def get_daily_community_contact_rate(self, ind_id, age):
         """
@@ -1236,76 +1423,115 @@ class Model:
         adjusted_contact_rate = raw_contact_rate - float(hh_size - 1)
         return max(0., adjusted_contact_rate)
 
-    def apply_transmission(self, contact_dict, relative_infectiousness, index_id):
-        """
-        At this stage, contacts of ind_id have been defined (information contained in contact_dict) but we still don't
-        know whether they are associated with transmission. This method will trigger possible transmission events.
-        """
-        index_age = floor(self.individuals[index_id].get_age_in_years(self.time))
-        for location in contact_dict.keys():
-            for contacted_id, nb_contacts in contact_dict[location].iteritems():
-                transmission_proba = self.params['proba_infection_per_contact'] *\
-                                     self.individuals[contacted_id].get_relative_susceptibility(self.time, self.params) *\
-                                     relative_infectiousness
-
-                # relative contact fitness according to location
-                transmission_proba *= self.params['rr_transmission_by_location'][location]
-
-                success_proba = 1. - (1. - transmission_proba)**nb_contacts
-                transmission = np.random.binomial(1, success_proba)
-
-                if transmission == 1:  # transmission does occur
-                    contact_age = floor(self.individuals[contacted_id].get_age_in_years(self.time))
-                    self.n_contacts['transmission'][location] += 1
-                    if index_age <= 100. and contact_age <= 100.:
-                        self.contact_matrices['transmission'][location][int(index_age), int(contact_age)] += 1
-                    # diseased (or future diseased) individuals are not affected with reinfection
-                    if not self.individuals[contacted_id].active_tb and 'activation' not in \
-                            self.individuals[contacted_id].programmed.keys():
-                        if not self.individuals[contacted_id].ltbi:  # This is a newly infected individual
-                            self.ltbi_prevalence += 1
-                        self.infect_an_individual(contacted_id, strain=self.individuals[index_id].tb_strain)
-                        if 'activation' in self.individuals[contacted_id].programmed.keys():  # responsible for a new TB case
-                            self.n_contacts['transmission_end_tb'][location] += 1
-                            if index_age <= 100. and contact_age <= 100.:
-                                self.contact_matrices['transmission_end_tb'][location][int(index_age), int(contact_age)] += 1
-                        if self.params['ideal_pt_program'] and self.time >= \
-                                        365.25*(self.params['duration_burning_demo'] +
-                                                    self.params['duration_burning_tb'] + self.params['intervention_start_delay']):  # PT is provided to all infectees, as soon as they get infected
-                            self.provide_preventive_treatment(contacted_id, delayed=False)
-
-    def update_contact_matrices(self, ind_id, contact_dict):
-        """
-        contact_dict contains the recorded contacts of individual 'ind_id' during the last time step.
-        The contact matrix is updated accordingly.
-        """
-        age_ind_id = floor(self.individuals[ind_id].get_age_in_years(self.time))
-        if age_ind_id <= 100.:
-            for location in contact_dict.keys():
-                for contacted_id, nb_contacts in contact_dict[location].iteritems():
-                    age_contacted = floor(self.individuals[contacted_id].get_age_in_years(self.time))
-                    if age_contacted <= 100.:
-                        self.contact_matrices['contact'][location][int(age_ind_id), int(age_contacted)] += nb_contacts
+    def get_community_thinning_proba(self, relative_infectiousness):
+        """
+        Upper bound of the probability that a single community contact of an index case with the given relative
+        infectiousness leads to transmission. Susceptibility is bounded by that of an unvaccinated individual, or of a
+        latently infected one if latent infection increases susceptibility.
+        """
+        max_susceptibility = max(1., self.params['latent_protection_multiplier'])
+        return min(self.params['proba_infection_per_contact'] * relative_infectiousness * max_susceptibility *
+                   self.params['rr_transmission_by_location']['community'], 1.)
+
+    def apply_transmission(self, index_ids, contact_ids, location_indices, nb_contacts, relative_infectiousness,
+                           thinning_probas=None):
+        """
+        At this stage, the contacts of the infectious cases have been defined but we still don't know whether they are
+        associated with transmission. This method will trigger possible transmission events.
+        The contacts are described by flat arrays of the same length: ids of the index cases, ids of the contacted
+        individuals, indices of the locations in self.locations, nb of contacts and relative infectiousness of the
+        index cases. thinning_probas gives, for each contact, the probability with which it was kept when the contacts
+        were drawn (1 for contacts that were not thinned).
+        """
+        susceptibility_table = self.get_susceptibility_table()
+        susceptibilities = susceptibility_table.get_relative_susceptibilities(self.population_data, contact_ids,
+                                                                              self.time)
+        transmission_proba = self.params['proba_infection_per_contact'] * relative_infectiousness * susceptibilities
+
+        # relative contact fitness according to location
+        transmission_proba *= np.array([self.params['rr_transmission_by_location'][location] for location in
+                                        self.locations])[location_indices]
+
+        # thinned contacts are only accepted according to the actual susceptibility of the contacted individual
+        if thinning_probas is not None:
+            thinned = thinning_probas < 1.
+            transmission_proba[thinned] = np.minimum(transmission_proba[thinned], 1.) / thinning_probas[thinned]
+
+        success_proba = 1. - (1. - transmission_proba)**nb_contacts
+        transmitting = np.nonzero(np.random.random_sample(len(contact_ids)) < success_proba)[0]
+
+        # serial pass over the transmission events. Susceptibility may have changed since the draws were made for the
+        # individuals infected or treated earlier in this pass, in which case the transmission is thinned accordingly.
+        modified_ids = set()
+        transmissions, transmissions_end_tb = [], []
+        ideal_pt = self.params['ideal_pt_program'] and self.time >= 365.25 * (
+            self.params['duration_burning_demo'] + self.params['duration_burning_tb'] +
+            self.params['intervention_start_delay'])  # PT is provided to all infectees, as soon as they get infected
+        for k in transmitting.tolist():
+            contacted_id = int(contact_ids[k])
+            if contacted_id in modified_ids:
+                new_transmission_proba = transmission_proba[k] / susceptibilities[k] *\
+                    susceptibility_table.get_relative_susceptibility(self.individuals[contacted_id], self.time)
+                new_success_proba = 1. - (1. - new_transmission_proba)**nb_contacts[k]
+                if self.random_streams.uniform() * success_proba[k] >= new_success_proba:
+                    continue
+            transmissions.append(k)
+            # diseased (or future diseased) individuals are not affected with reinfection
+            if not self.individuals[contacted_id].active_tb and 'activation' not in \
+                    self.individuals[contacted_id].programmed.keys():
+                if not self.individuals[contacted_id].ltbi:  # This is a newly infected individual
+                    self.ltbi_prevalence += 1
+                self.infect_an_individual(contacted_id, strain=self.individuals[int(index_ids[k])].tb_strain_code)
+                modified_ids.add(contacted_id)
+                if 'activation' in self.individuals[contacted_id].programmed.keys():  # responsible for a new TB case
+                    transmissions_end_tb.append(k)
+                if ideal_pt:
+                    self.provide_preventive_treatment(contacted_id, delayed=False)
+
+        self.record_transmissions('transmission', transmissions, index_ids, contact_ids, location_indices)
+        self.record_transmissions('transmission_end_tb', transmissions_end_tb, index_ids, contact_ids, location_indices)
+
+    def record_transmissions(self, key, transmissions, index_ids, contact_ids, location_indices):
+        """
+        Update self.n_contacts[key] and self.contact_matrices[key] with the contacts listed in transmissions (indices in
+        the arrays index_ids, contact_ids and location_indices)
+        """
+        if len(transmissions) == 0:
+            return
+        self.add_to_contact_matrices(key, index_ids[transmissions], contact_ids[transmissions],
+                                     location_indices[transmissions], np.ones(len(transmissions)))
+
+    def add_to_contact_matrices(self, key, index_ids, contact_ids, location_indices, nb_contacts):
+        """
+        Update self.n_contacts[key] and self.contact_matrices[key] with the contacts described by flat arrays of the same
+        length: ids of the index individuals, ids of the contacted individuals, indices of the locations in
+        self.locations and nb of contacts.
+        """
+        index_ages = np.floor(self.population_data.get_ages_in_years(index_ids, self.time)).astype(int)
+        contact_ages = np.floor(self.population_data.get_ages_in_years(contact_ids, self.time)).astype(int)
+        in_matrix = (index_ages <= 100) & (contact_ages <= 100)
+        for location_index, location in enumerate(self.locations):
+            at_location = location_indices == location_index
+            self.n_contacts[key][location] += int(nb_contacts[at_location].sum())
+            at_location &= in_matrix
+            np.add.at(self.contact_matrices[key][location], (index_ages[at_location], contact_ages[at_location]),
+                      nb_contacts[at_location])
 
     def trigger_programmed_deaths(self):
         """
         The individuals listed in the programmed_deaths dictionary for the times elapsed since the last iteration time
         have to die.
         """
-        for death_time in [d for d in self.programmed_events['death'].keys() if d <= self.time]:
-            for ind_id in self.programmed_events['death'][death_time]:
-                self.make_individual_die(ind_id)
-            del self.programmed_events['death'][death_time]
+        for ind_id in self.programmed_events.pop_due('death', self.time):
+            self.make_individual_die(ind_id)
 
     def trigger_programmed_tb_deaths(self):
         """
         The individuals listed in the programmed_deaths dictionary for the times elapsed since the last iteration time
         have to die.
         """
-        for death_time in [d for d in self.programmed_events['tb_death'].keys() if d <= self.time]:
-            for ind_id in self.programmed_events['tb_death'][death_time]:
-                self.make_individual_die(ind_id)
-            del self.programmed_events['tb_death'][death_time]
+        for ind_id in self.programmed_events.pop_due('tb_death', self.time):
+            self.make_individual_die(ind_id)
 
     def make_individual_die(self, ind_id):
         """
@@ -1315,24 +1541,21 @@ class Model:
         """
         if self.individuals[ind_id].active_tb:
             self.tb_prevalence -= 1
-            if self.individuals[ind_id].tb_strain == 'ds':
+            if self.individuals[ind_id].tb_strain_code == population.DS:
                 self.tb_prevalence_ds -= 1
             else:
                 self.tb_prevalence_mdr -= 1
-            self.active_cases = [ind for ind in self.active_cases if ind != ind_id]
+            self.active_cases.remove(ind_id)
+            self.infectious_cases.discard(ind_id)
             self.tb_deaths += 1
 
         if self.individuals[ind_id].ltbi:
             self.ltbi_prevalence -= 1
 
-        del self.dates_of_birth[ind_id]
         self.clean_programmed_dictionaries(ind_id)
         self.remove_from_groups(ind_id)
 
-        age_cat = get_agecategory(self.individuals[ind_id].get_age_in_years(self.time), 'prem')
-        if ind_id not in self.ind_by_agegroup[age_cat]: # the individual was still recorded in the previous age_category
-            age_cat = get_agecategory(self.individuals[ind_id].get_age_in_years(self.time - 365.25), 'prem')
-        self.ind_by_agegroup[age_cat] = [ind for ind in self.ind_by_agegroup[age_cat] if ind != ind_id]
+        self.age_index.remove(ind_id)
 
         previous_hh_id = self.individuals[ind_id].household_id
         self.households[previous_hh_id].size -= 1
@@ -1343,35 +1566,31 @@ class Model:
 
         # The previous household may become empty and eligible for a new couple to move in
         if self.households[previous_hh_id].size == 0:
-            if previous_hh_id in self.eligible_hh_for_birth.keys():
+            if previous_hh_id in self.eligible_hh_for_birth:
                 self.households[previous_hh_id].repopulate_date = -1.e8
-                del(self.eligible_hh_for_birth[previous_hh_id])
-            self.empty_households.append(previous_hh_id)
+            self.empty_households.add(previous_hh_id)
+        self.update_weight_for_birth(previous_hh_id)
 
         del self.individuals[ind_id]
+        self.population_data.release(ind_id)
 
-        if self.fertility_replacement:
-            self.make_individual_bear()
+        if self.fertility_replacement:  # the newborns replacing the dead individuals are generated at the end of the step
+            self.nb_replacement_births += 1
 
     def clean_programmed_dictionaries(self, ind_id):
         """
         Individual ind_id is about to die. We need to clean up a few dicitonaries.
         """
 
-        keys_to_loop = self.programmed_events.keys()
-        for key in keys_to_loop:
-            if key in self.individuals[ind_id].programmed.keys():
-                if self.individuals[ind_id].programmed[key] in self.programmed_events[key].keys():
-                    self.programmed_events[key][self.individuals[ind_id].programmed[key]] = \
-                        [ids for ids in self.programmed_events[key][self.individuals[ind_id].programmed[key]]
-                         if ids != ind_id]
+        for handle in self.individuals[ind_id].event_handles.values():
+            self.programmed_events.cancel(handle)
+        self.individuals[ind_id].event_handles = {}
 
-        if ind_id in self.individuals_want_to_move.keys():
-            del(self.individuals_want_to_move[ind_id])
+        self.individuals_want_to_move.discard(ind_id)
 
     def remove_from_groups(self, ind_id):
         for group_id in self.individuals[ind_id].group_ids:
-            self.groups[group_id] = [ind for ind in self.groups[group_id] if ind != ind_id]
+            self.groups[group_id].remove(ind_id)
 
     def trigger_births(self):
 
@@ -1383,19 +1602,28 @@ class Model:
             average_nb_births_per_step = self.birth_numbers_function(time_to_pyramid)
 
         nb_births = np.random.poisson(average_nb_births_per_step)
-        for _ in repeat(None, nb_births):  # supposed to be faster than a classic for loop
-            self.make_individual_bear()
+        self.make_individuals_bear(nb_births)
 
-    def make_individual_bear(self, ind_id=None):
-        self.population += 1
-        self.birth_numbers += 1
-        hh_id = self.pick_eligible_household_for_birth()
-        self.add_new_individual_in_hh(h_id=hh_id, age=0., ind_id=ind_id)
-        if hh_id in self.empty_households:
-            self.empty_households = [h for h in self.empty_households if h != hh_id]
+    def trigger_replacement_births(self):
+        """
+        With fertility replacement, each individual who died during the step is replaced by a newborn.
+        """
+        self.make_individuals_bear(self.nb_replacement_births)
+        self.nb_replacement_births = 0
 
-        if hh_id in self.eligible_hh_for_birth.keys():
-            del self.eligible_hh_for_birth[hh_id]
+    def make_individuals_bear(self, nb_births):
+        """
+        Generate nb_births newborns in eligible households. All the random characteristics of the newborns are drawn at
+        once.
+        """
+        if nb_births == 0:
+            return
+        self.population += nb_births
+        self.birth_numbers += nb_births
+        hh_ids = self.pick_eligible_households_for_birth(nb_births)
+        self.add_new_individuals_in_hh(hh_ids, ages=np.zeros(nb_births))
+        for hh_id in hh_ids:
+            self.empty_households.discard(hh_id)
 
     def update_programmed_events(self, event_dict, ind_id=None):
         """
@@ -1410,21 +1638,16 @@ class Model:
             self.add_detection_to_programmed_detections(ind_id, event_dict['detection'])
 
     def add_detection_to_programmed_detections(self, ind_id, detection_date):
-        if detection_date in self.programmed_events['detection'].keys():
-            self.programmed_events['detection'][detection_date].append(ind_id)
-        else:
-            self.programmed_events['detection'][detection_date] = [ind_id]
+        self.schedule_event('detection', detection_date, ind_id)
 
     def trigger_programmed_detections(self):
         """
         The individuals listed in the programmed_recoveries dictionary for the times elapsed since the last iteration time
         have to recover from TB.
         """
-        for detection_time in [d for d in self.programmed_events['detection'].keys() if d <= self.time]:
-            for ind_id in self.programmed_events['detection'][detection_time]:
-                self.detect_individual(ind_id)
-                self.trigger_hh_based_acf(ind_id)
-            del self.programmed_events['detection'][detection_time]
+        for ind_id in self.programmed_events.pop_due('detection', self.time):
+            self.detect_individual(ind_id)
+            self.trigger_hh_based_acf(ind_id)
 
     def detect_individual(self, ind_id):
         self.individuals[ind_id].detect_tb()
@@ -1440,23 +1663,15 @@ class Model:
             for c_id in hh_contact_ids:
                 if self.individuals[c_id].active_tb:
                     # remove potential programmed detection
-                    if 'detection' in self.individuals[ind_id].programmed.keys():
-                        for date in self.programmed_events['detection'].keys():
-                            if ind_id in self.programmed_events['detection'][date]:
-                                self.programmed_events['detection'][date] = [indiv for indiv in
-                                                                            self.programmed_events['detection'][date] if
-                                                                            indiv != ind_id]
+                    self.cancel_event('detection', ind_id)
                     tb_outcome = self.individuals[ind_id].overwrite_tb_outcome_after_acf_detection(time=self.time,
                                                                                                    params=self.params,
-                                                                tx_success_prop=self.scale_up_functions_current_time['treatment_success_prop'])
+                                                                tx_success_prop=self.scale_up_functions_current_time['treatment_success_prop'],
+                                                                random_streams=self.random_streams)
 
                     if 'recovery' in tb_outcome.keys():
                         # remove previously scheduled recovery
-                        for date in self.programmed_events['recovery'].keys():
-                            if ind_id in self.programmed_events['recovery'][date]:
-                                self.programmed_events['recovery'][date] = [indiv for indiv in
-                                                                            self.programmed_events['recovery'][date] if
-                                                                            indiv != ind_id]
+                        self.cancel_event('recovery', ind_id)
 
                     if 'dr_amplification' in tb_outcome.keys():
                         self.tb_prevalence_ds -= 1  # should be improved in the future as dr_amplification should occur later at treatment
@@ -1478,16 +1693,13 @@ class Model:
 
         all_identified_contacts = []
         for contact_type in relevant_contact_types:
-            if self.params['agegroup_for_contact_tracing_pt'] == 'all':
-                relevant_contacts = list(self.individuals[ind_id].contacts_while_tb[contact_type])
-                relevant_contacts = [ind for ind in relevant_contacts if ind in self.individuals.keys()]
-            else:
-                relevant_contacts = []
-                for contact_id in self.individuals[ind_id].contacts_while_tb[contact_type]:
-                    if contact_id in self.individuals.keys():
-                        if self.individuals[contact_id].is_in_subgroup(
-                                subgroup=self.params['agegroup_for_contact_tracing_pt'], time=self.time):
-                            relevant_contacts.append(contact_id)
+            # contacts are recorded as (id, generation) pairs so that the ids recycled after death are not traced
+            relevant_contacts = self.population_data.get_alive_ids(
+                self.individuals[ind_id].contacts_while_tb[contact_type]).tolist()
+            if self.params['agegroup_for_contact_tracing_pt'] != 'all':
+                relevant_contacts = [contact_id for contact_id in relevant_contacts if
+                                     self.individuals[contact_id].is_in_subgroup(
+                                         subgroup=self.params['agegroup_for_contact_tracing_pt'], time=self.time)]
 
             if len(relevant_contacts) > 0:
                 nb_identified_contacts = int(round(len(relevant_contacts)*self.params['perc_coverage_tracing_' + contact_type]/100.))
@@ -1509,39 +1721,35 @@ class Model:
                     shall_we_test = True
 
             if shall_we_test:
-                ltbi_test = self.individuals[contact_id].test_individual_for_ltbi(self.params)
+                ltbi_test = self.individuals[contact_id].test_individual_for_ltbi(self.params, self.random_streams)
                 if ltbi_test:
                     self.provide_preventive_treatment(contact_id, delayed=True)
             else:  # provide pt without testing
                 self.provide_preventive_treatment(contact_id, delayed=False)
 
     def add_recovery_to_programmed_recoveries(self, ind_id, recovery_date):
-        if recovery_date in self.programmed_events['recovery'].keys():
-            self.programmed_events['recovery'][recovery_date].append(ind_id)
-        else:
-            self.programmed_events['recovery'][recovery_date] = [ind_id]
+        self.schedule_event('recovery', recovery_date, ind_id)
 
     def trigger_programmed_recoveries(self):
         """
         The individuals listed in the programmed_recoveries dictionary for the times elapsed since the last iteration time
         have to recover from TB.
         """
-        for recovery_time in [d for d in self.programmed_events['recovery'].keys() if d <= self.time]:
-            for ind_id in self.programmed_events['recovery'][recovery_time]:
-                self.tb_prevalence -= 1
-                if self.individuals[ind_id].tb_strain == 'ds':
-                    self.tb_prevalence_ds -= 1
-                else:
-                    self.tb_prevalence_mdr -= 1
-                self.make_individual_recover(ind_id)
-            del self.programmed_events['recovery'][recovery_time]
+        for ind_id in self.programmed_events.pop_due('recovery', self.time):
+            self.tb_prevalence -= 1
+            if self.individuals[ind_id].tb_strain_code == population.DS:
+                self.tb_prevalence_ds -= 1
+            else:
+                self.tb_prevalence_mdr -= 1
+            self.make_individual_recover(ind_id)
 
     def make_individual_recover(self, ind_id):
         """
         Make an individual recover and update the relevant dictionaries
         """
         self.individuals[ind_id].recover()
-        self.active_cases = [ind for ind in self.active_cases if ind != ind_id]
+        self.active_cases.remove(ind_id)
+        self.infectious_cases.discard(ind_id)
 
     def program_tb_death(self, ind_id, date_of_tb_death):
         """
@@ -1549,10 +1757,8 @@ class Model:
         record the new time of programmed death.
         """
 
-        previous_dOD = self.individuals[ind_id].programmed['death']
         # remove previously programmed death (natural death)
-        self.programmed_events['death'][previous_dOD] = [inds for inds in self.programmed_events['death'][previous_dOD]
-                                                if inds != ind_id]
+        self.cancel_event('death', ind_id)
         self.individuals[ind_id].programmed['death'] = date_of_tb_death
 
         self.add_event_to_programmed_events('tb_death', ind_id)  # re-define the date of death
@@ -1561,17 +1767,14 @@ class Model:
         """
         Make individual "ind_id" infected and define the time to potential activation
         """
-        self.individuals[ind_id].infect_individual(self.time, self.params, strain)
+        self.individuals[ind_id].infect_individual(self.time, self.params, strain, self.random_streams)
         self.activation_stats['n_infections'] += 1
         if 'activation' in self.individuals[ind_id].programmed.keys():
             self.add_activation_to_programmed_activations(ind_id)
             self.activation_stats['n_activations'] += 1
 
     def add_activation_to_programmed_activations(self, ind_id):
-        if self.individuals[ind_id].programmed['activation'] in self.programmed_events['activation'].keys():
-            self.programmed_events['activation'][self.individuals[ind_id].programmed['activation']].append(ind_id)
-        else:
-            self.programmed_events['activation'][self.individuals[ind_id].programmed['activation']] = [ind_id]
+        self.schedule_event('activation', self.individuals[ind_id].programmed['activation'], ind_id)
 
     def provide_preventive_treatment(self, ind_id, delayed=False):
         """
@@ -1581,12 +1784,10 @@ class Model:
         """
         self.n_pt_provided += 1.
         pre_ltbi = copy.copy(self.individuals[ind_id].ltbi)
-        date_prevented_activation = self.individuals[ind_id].get_preventive_treatment(self.params, time=self.time, delayed=delayed)
+        date_prevented_activation = self.individuals[ind_id].get_preventive_treatment(self.params, self.random_streams, time=self.time,
+                                                                                   delayed=delayed)
         if date_prevented_activation is not None:  # The treatment is successful and useful
-            self.programmed_events['activation'][date_prevented_activation] = [ids for ids in \
-                                                                                self.programmed_events['activation'][
-                                                                                    date_prevented_activation]
-                                                                                                  if ids != ind_id]
+            self.cancel_event('activation', ind_id)
             self.n_useful_pt_provided += 1.
         if pre_ltbi and not self.individuals[ind_id].ltbi:
             self.ltbi_prevalence -= 1
@@ -1599,9 +1800,8 @@ class Model:
         if self.stopped_simulation:   # we don't want to store ages for individuals when model has stopped running.
             self.checkpoint_outcomes['ages'][self.time] = []
         else:
-            self.checkpoint_outcomes['ages'][self.time] = [
-                individual.get_age_in_years(self.time) for
-                individual in self.individuals.values()]
+            self.checkpoint_outcomes['ages'][self.time] = self.population_data.get_ages_in_years(
+                self.population_data.alive_ids(), self.time).tolist()
 
         # Household size distribition
         self.checkpoint_outcomes['household_sizes'][self.time] = [h.size for h in self.households.values()]
@@ -1713,16 +1913,15 @@ class Model:
             if target['indicator'] == 'tb_prevalence':
                 abs_prev = 0
                 for ind_id in self.active_cases:
-                    if '_smearpos' in target['category'] and self.individuals[ind_id].tb_organ != '_smearpos':
+                    if '_smearpos' in target['category'] and self.individuals[ind_id].tb_organ_code != population.SMEARPOS:
                         continue
-                    if '_pulmonary' in target['category'] and self.individuals[ind_id].tb_organ == '_extrapulmonary':
+                    if '_pulmonary' in target['category'] and \
+                            self.individuals[ind_id].tb_organ_code == population.EXTRAPULMONARY:
                         continue
                     if 'more_than_15' in target['category'] and self.individuals[ind_id].get_age_in_years(self.time) < 15.:
                         continue
                     abs_prev += 1
-                nb_kids = 0
-                for age_cat in ['X_1', 'X_2', 'X_3']:
-                    nb_kids += len(self.ind_by_agegroup[age_cat])
+                nb_kids = self.age_index.count(0., 15., self.time)
                 deno = self.population - nb_kids
                 model_measure = abs_prev * 1.e5 / deno
                 print model_measure
@@ -1778,11 +1977,12 @@ class Model:
 
 
 class TbModel(Model):
-    def __init__(self, data, i_seed, scenario, i_run, initialised=True):
+    def __init__(self, data, i_seed, scenario, i_run, initialised=True, snapshot_cache=None):
 
         Model.__init__(self, data, i_seed, scenario, i_run, initialised)
 
-        self.active_cases = []
+        self.active_cases = membership.IndexedSet()
+        self.infectious_cases = membership.IndexedSet()  # active cases that are not extrapulmonary
         self.all_tb_ages = []
         self.tb_prevalence_by_age = []
         self.transmission = False  # will become the same as the inputed parameter when demographic burning is done
@@ -1799,7 +1999,8 @@ class TbModel(Model):
         self.n_pt_provided = 0  # absolute number of prev treatments provided during the current time-step
         self.n_useful_pt_provided = 0  # absolute number of prev treatments leading to infection cure
 
-        self.programmed_events.update({'activation': {}, 'detection': {}, 'recovery': {}, 'tb_death': {}})
+        for event_type in ['activation', 'detection', 'recovery', 'tb_death']:
+            self.programmed_events.add_event_type(event_type)
 
         # attributes pertaining to the series that need smoothing by moving average
         self.timeseries_to_average = ['tb_incidence', 'tb_deaths', 'n_pt_provided', 'n_useful_pt_provided']
@@ -1807,17 +2008,59 @@ class TbModel(Model):
 
         self.initialised = initialised
         if not initialised:
-            self.initialise_model(data)
+            self.initialise_model(data, snapshot_cache)
 
     def spread_infections(self):
         """
-        Rules the whole transmission process.
-        """
-        for ind_id in self.active_cases:
-            relative_infectiousness = self.individuals[ind_id].get_relative_infectiousness(self.params, self.time)
+        Rules the whole transmission process. The relative infectiousness of the pulmonary TB cases is evaluated at once
+        and the contacts of the cases that are infectious are gathered into flat arrays so that transmission is
+        evaluated for all of them at once. Household contacts are drawn for all the cases in a single pass.
+        In thinned community transmission mode, only the community contacts that may lead to transmission are drawn.
+        Contact tracing needs the full list of contacts, so that all community contacts are generated when it is on.
+        """
+        thinned_community = self.params['thinned_community_transmission'] and \
+            not self.params['contact_tracing_pt_program']
+        community_thinning_proba = 1.
+        index_ids, contact_ids, location_indices, nb_contacts, infectiousness, thinning_probas = [], [], [], [], [], []
+        hh_index_ids, hh_recording_durations, hh_infectiousness = [], [], []
+        case_ids = self.infectious_cases.ids.copy()
+        infectiousness_by_case = agent.get_relative_infectiousnesses(self.population_data, case_ids, self.time,
+                                                                     self.params)
+        for ind_id, relative_infectiousness in zip(case_ids.tolist(), infectiousness_by_case.tolist()):
             if relative_infectiousness > 0.:  # the index case is infectious
-                contact_dict = self.get_contacts_during_last_step(ind_id)  # returns a dictionary keyed with contact ids, valued with nb of contacts
-                self.apply_transmission(contact_dict, relative_infectiousness, index_id=ind_id)
+                recording_duration = self.get_recording_duration(ind_id)
+                if recording_duration == 0:
+                    continue
+                hh_index_ids.append(ind_id)
+                hh_recording_durations.append(recording_duration)
+                hh_infectiousness.append(relative_infectiousness)
+                if thinned_community:
+                    community_thinning_proba = self.get_community_thinning_proba(relative_infectiousness)
+                contact_dict = self.get_contacts_during_last_step(ind_id, community_thinning_proba=community_thinning_proba,
+                                                                  include_household=False)  # returns a dictionary keyed with contact ids, valued with nb of contacts
+                for location_index, location in enumerate(self.locations):
+                    n = len(contact_dict[location])
+                    if n > 0:
+                        index_ids.extend([ind_id] * n)
+                        contact_ids.extend(contact_dict[location].keys())
+                        location_indices.extend([location_index] * n)
+                        nb_contacts.extend(contact_dict[location].values())
+                        infectiousness.extend([relative_infectiousness] * n)
+                        thinning_probas.extend([community_thinning_proba if location == 'community' else 1.] * n)
+        if len(hh_index_ids) == 0:
+            return
+        hh_index_ids = np.array(hh_index_ids)
+        positions, hh_contact_ids, hh_nb_contacts = self.draw_household_contacts(hh_index_ids,
+                                                                                 np.array(hh_recording_durations))
+        n_hh = len(hh_contact_ids)
+        if len(contact_ids) + n_hh > 0:
+            self.apply_transmission(np.concatenate((np.array(index_ids, dtype=int), hh_index_ids[positions])),
+                                    np.concatenate((np.array(contact_ids, dtype=int), hh_contact_ids)),
+                                    np.concatenate((np.array(location_indices, dtype=int),
+                                                    np.full(n_hh, self.locations.index('household'), dtype=int))),
+                                    np.concatenate((np.array(nb_contacts, dtype=float), hh_nb_contacts)),
+                                    np.concatenate((np.array(infectiousness), np.array(hh_infectiousness)[positions])),
+                                    np.concatenate((np.array(thinning_probas), np.ones(n_hh))))
 
     def process_cdr(self):
         """
@@ -1859,35 +2102,26 @@ class TbModel(Model):
         self.ltbi_age_stats_have_been_recorded = False
 
     def record_ltbi_ages(self):
-        for individual in self.individuals.values():
-            if individual.ltbi:
-                age = individual.get_age_in_years(self.time)
-                self.ltbi_age_stats['ltbi_ages'].append(age)
-                if 'activation' in individual.programmed.keys():
-                    self.ltbi_age_stats['ending_tb_ages'].append(age)
+        ind_ids = self.population_data.alive_ids()
+        ltbi_ids = ind_ids[self.population_data.ltbi[ind_ids]]
+        ages = self.population_data.get_ages_in_years(ltbi_ids, self.time)
+        self.ltbi_age_stats['ltbi_ages'].extend(ages.tolist())
+        ending_tb = ~np.isnan(self.population_data.programmed['activation'][ltbi_ids])
+        self.ltbi_age_stats['ending_tb_ages'].extend(ages[ending_tb].tolist())
 
     def record_tb_prevalence_by_age(self):
         self.tb_prevalence_by_age = []
         age_breaks = [0., 5., 10., 15., 25., 35., 45., 55., 65.]
-        age_cats = [['X_1'], ['X_2'], ['X_3'], ['X_4', 'X_5'], ['X_6', 'X_7'],  ['X_8', 'X_9'],  ['X_10', 'X_11'],
-                    ['X_12', 'X_13'], ['X_14', 'X_15', 'X_16']]
-        nb_cases = [0. for _ in range(len(age_breaks))]
         agegroup_size = []
 
         for i in range(len(age_breaks)):
-            pop_size = 0.
-            for age_cat in age_cats[i]:
-                pop_size += len(self.ind_by_agegroup[age_cat])
-            agegroup_size.append(pop_size)
+            age_max = age_breaks[i + 1] if i + 1 < len(age_breaks) else None
+            agegroup_size.append(float(self.age_index.count(age_breaks[i], age_max, self.time)))
 
         # calculate the absolute prevalence by age
-        for tb_case_id in self.active_cases:
-            tb_age = self.individuals[tb_case_id].get_age_in_years(self.time)
-            if tb_age >= 65.:
-                age_cat_index = 8
-            else:
-                age_cat_index = next(x[0] for x in enumerate(age_breaks) if tb_age <= x[1]) - 1
-            nb_cases[age_cat_index] += 1.
+        tb_ages = self.population_data.get_ages_in_years(self.active_cases.ids, self.time)
+        age_cat_indices = np.maximum(np.searchsorted(age_breaks, tb_ages, side='left') - 1, 0)
+        nb_cases = np.bincount(age_cat_indices, minlength=len(age_breaks)).astype(float)
 
         # make the prevalence as relative to age-group pop sizes
         for i in range(len(nb_cases)):
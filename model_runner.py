@@ -1,6 +1,7 @@
 import importData as imp
 import numpy as np
 import model
+import demographic_snapshots
 import copy
 import dill
 from scipy import stats
@@ -26,6 +27,10 @@ class ModelRunner:
         self.paths_to_calibrated_models = []
         self.nb_seeds = 1
         self.n_cpus = cpu_count()
+        self.snapshot_cache = None  # demographic_snapshots.SnapshotCache object if demographic snapshots are used
+        if self.data.console['use_demographic_snapshots']:
+            self.snapshot_cache = demographic_snapshots.SnapshotCache(os.path.join(self.base_path,
+                                                                                   'demographic_snapshots'))
 
         self.create_keep_running_file()
         self.initialise_simulation()
@@ -83,7 +88,8 @@ class ModelRunner:
                     m_init.adjust_attributes_after_calibration()
                     print '... done'
                 else:
-                    m_init = model.TbModel(self.data, i_seed=seed_index, scenario='init', i_run=-1, initialised=False)
+                    m_init = model.TbModel(self.data, i_seed=seed_index, scenario='init', i_run=-1, initialised=False,
+                                           snapshot_cache=self.snapshot_cache)
                 for scenario in self.data.scenarios:
                     m_init.scenario = scenario
                     m_init.reset_params(self.data)
@@ -101,7 +107,8 @@ class ModelRunner:
                     elif self.data.console['load_calibrated_models']:
                         m_init = self.load_model(scenario, calibrated=True, seed_index=seed_index)
                     else:
-                        m_init = model.TbModel(self.data, i_seed=seed_index, scenario=scenario, i_run=-1, initialised=False)
+                        m_init = model.TbModel(self.data, i_seed=seed_index, scenario=scenario, i_run=-1,
+                                               initialised=False, snapshot_cache=self.snapshot_cache)
 
                     m_init.reset_params(self.data)
                     m_init.collect_params(self.data)
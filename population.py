@@ -0,0 +1,208 @@
+import numpy as np
+import time
+from collections import deque
+
+# small-integer codes of the categorical TB characteristics
+NO_STRAIN, DS, MDR = 0, 1, 2
+NO_ORGAN, SMEARPOS, SMEARNEG, EXTRAPULMONARY = 0, 1, 2, 3
+STRAINS = [None, 'ds', 'mdr']  # indexed by strain code
+ORGANS = [None, '_smearpos', '_smearneg', '_extrapulmonary']  # indexed by organ code
+STRAIN_CODES = {strain: code for code, strain in enumerate(STRAINS)}
+ORGAN_CODES = {organ: code for code, organ in enumerate(ORGANS)}
+
+PROGRAMMED_EVENTS = ['death', 'leave_home', 'go_to_school', 'leave_school', 'leave_work', 'activation', 'detection',
+                     'recovery']
+
+# name, type and default value of the columns storing the individual characteristics
+COLUMNS = [('dOB', np.float64, 0.),
+           ('household_id', np.int64, -1),
+           ('diabetes', np.bool_, False),
+           ('hiv', np.bool_, False),
+           ('vaccinated', np.bool_, False),
+           ('ltbi', np.bool_, False),
+           ('tb_strain_code', np.int8, 0),
+           ('active_tb', np.bool_, False),
+           ('tb_organ_code', np.int8, 0),
+           ('tb_detected', np.bool_, False),
+           ('tb_treated', np.bool_, False),
+           ('die_with_tb', np.bool_, False),
+           ('is_ever_gonna_work', np.bool_, False)]
+
+
+class Population:
+    """
+    Columnar (struct-of-arrays) storage of the characteristics of all individuals. Individual ids are the row indices of
+    the columns. The ids of dead individuals are recycled through a free-list so that the columns stay compact.
+    Programmed dates are stored in the columns of self.programmed, NaN meaning that no event is programmed.
+    """
+    def __init__(self, capacity=1024):
+        self.capacity = 0
+        self.n_allocated = 0  # ids in [0, n_allocated) have been used at least once
+        self.free_ids = deque()  # released ids, recycled in FIFO order
+        self.alive = np.zeros(0, dtype=np.bool_)
+        self.generation = np.zeros(0, dtype=np.int32)  # incremented each time an id is released
+        for name, dtype, default in COLUMNS:
+            setattr(self, name, np.zeros(0, dtype=dtype))
+        self.programmed = {}
+        for event_type in PROGRAMMED_EVENTS:
+            self.programmed[event_type] = np.zeros(0, dtype=np.float64)
+        self.grow(capacity)
+
+    def grow(self, new_capacity):
+        """
+        Extend all columns so that they can store new_capacity individuals
+        """
+        n_new = new_capacity - self.capacity
+        self.alive = np.concatenate((self.alive, np.zeros(n_new, dtype=np.bool_)))
+        self.generation = np.concatenate((self.generation, np.zeros(n_new, dtype=np.int32)))
+        for name, dtype, default in COLUMNS:
+            setattr(self, name, np.concatenate((getattr(self, name), np.full(n_new, default, dtype=dtype))))
+        for event_type in PROGRAMMED_EVENTS:
+            self.programmed[event_type] = np.concatenate((self.programmed[event_type], np.full(n_new, np.nan)))
+        self.capacity = new_capacity
+
+    def allocate(self):
+        """
+        Reserve the storage for a new individual and return its id. Released ids are recycled first.
+        """
+        if len(self.free_ids) > 0:
+            ind_id = self.free_ids.popleft()
+        else:
+            if self.n_allocated == self.capacity:
+                self.grow(2 * self.capacity)
+            ind_id = self.n_allocated
+            self.n_allocated += 1
+        self.reset(ind_id)
+        self.alive[ind_id] = True
+        return ind_id
+
+    def allocate_many(self, n):
+        """
+        Vectorised version of allocate for n new individuals. Released ids are recycled first, in the same order.
+        return: an array of n ids
+        """
+        n_recycled = min(n, len(self.free_ids))
+        recycled_ids = [self.free_ids.popleft() for _ in range(n_recycled)]
+        n_new = n - n_recycled
+        if self.n_allocated + n_new > self.capacity:
+            self.grow(max(2 * self.capacity, self.n_allocated + n_new))
+        ind_ids = np.array(recycled_ids + range(self.n_allocated, self.n_allocated + n_new), dtype=np.int64)
+        self.n_allocated += n_new
+        for name, dtype, default in COLUMNS:
+            getattr(self, name)[ind_ids] = default
+        for event_type in PROGRAMMED_EVENTS:
+            self.programmed[event_type][ind_ids] = np.nan
+        self.alive[ind_ids] = True
+        return ind_ids
+
+    def release(self, ind_id):
+        """
+        Individual ind_id has died. Its id becomes available for a future individual.
+        """
+        self.alive[ind_id] = False
+        self.generation[ind_id] += 1
+        self.free_ids.append(ind_id)
+
+    def reset(self, ind_id):
+        """
+        Set all the characteristics of individual ind_id to their default values
+        """
+        for name, dtype, default in COLUMNS:
+            getattr(self, name)[ind_id] = default
+        for event_type in PROGRAMMED_EVENTS:
+            self.programmed[event_type][ind_id] = np.nan
+
+    def alive_ids(self):
+        """
+        return: an array containing the ids of all the individuals currently alive
+        """
+        return np.nonzero(self.alive[:self.n_allocated])[0]
+
+    def get_ages_in_years(self, ind_ids, time):
+        return (time - self.dOB[ind_ids]) / 365.25
+
+    def get_references(self, ind_ids):
+        """
+        References to individuals that must remain valid after their death, when their ids may have been recycled.
+        return: a list of (id, generation) pairs
+        """
+        ind_ids = np.asarray(ind_ids)
+        return zip(ind_ids.tolist(), self.generation[ind_ids].tolist())
+
+    def get_alive_ids(self, references):
+        """
+        references: a sequence of (id, generation) pairs obtained from get_references
+        return: an array with the ids of the referenced individuals that are still alive
+        """
+        if len(references) == 0:
+            return np.zeros(0, dtype=np.int64)
+        ind_ids, generations = np.array(list(references), dtype=np.int64).T
+        return ind_ids[self.alive[ind_ids] & (self.generation[ind_ids] == generations)]
+
+
+class ProgrammedView(object):
+    """
+    Dictionary-like access to the programmed dates of a single individual. Keys are event types and only the events
+    that are currently programmed are listed as keys.
+    """
+    __slots__ = ('population', 'ind_id')
+
+    def __init__(self, population, ind_id):
+        self.population = population
+        self.ind_id = ind_id
+
+    def __getitem__(self, event_type):
+        date = self.population.programmed[event_type][self.ind_id]
+        if np.isnan(date):
+            raise KeyError(event_type)
+        return date
+
+    def __setitem__(self, event_type, date):
+        self.population.programmed[event_type][self.ind_id] = np.nan if date is None else date
+
+    def __delitem__(self, event_type):
+        self[event_type]  # raise KeyError if the event was not programmed
+        self.population.programmed[event_type][self.ind_id] = np.nan
+
+    def __contains__(self, event_type):
+        return not np.isnan(self.population.programmed[event_type][self.ind_id])
+
+    def get(self, event_type, default=None):
+        if event_type in self:
+            return self[event_type]
+        return default
+
+    def keys(self):
+        return [event_type for event_type in PROGRAMMED_EVENTS if event_type in self]
+
+    def clear(self):
+        for event_type in PROGRAMMED_EVENTS:
+            self.population.programmed[event_type][self.ind_id] = np.nan
+
+
+def benchmark_liveness_checks(population_sizes=(10000, 100000, 1000000), n_contacts=50, n_repeats=5):
+    """
+    Cost of filtering the living individuals out of a list of n_contacts traced contacts, as done when contact tracing
+    is triggered. The former dictionary-keys scan is compared to the liveness test on the population columns.
+    """
+    print "population  keys scan (us)  columns (us)"
+    for n in population_sizes:
+        population_data = Population(capacity=n)
+        for _ in range(n):
+            population_data.allocate()
+        individuals = dict.fromkeys(range(n))
+        contact_ids = np.random.randint(0, n, n_contacts).tolist()
+        references = population_data.get_references(contact_ids)
+        t_0 = time.time()
+        for _ in range(n_repeats):
+            [ind_id for ind_id in contact_ids if ind_id in individuals.keys()]
+        t_keys = 1.e6 * (time.time() - t_0) / n_repeats
+        t_0 = time.time()
+        for _ in range(n_repeats):
+            population_data.get_alive_ids(references)
+        t_columns = 1.e6 * (time.time() - t_0) / n_repeats
+        print "%10d  %14.1f  %12.1f" % (n, t_keys, t_columns)
+
+
+if __name__ == "__main__":
+    benchmark_liveness_checks()
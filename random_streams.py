@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class RandomStreams(object):
+    """
+    Source of the scalar random draws made at the individual level. Uniform and standard exponential variates are
+    generated by blocks of block_size values and handed out one at a time, which avoids the overhead of a NumPy call
+    for every single draw. Other distributions are derived from these two streams.
+    Each model owns its RandomStreams object, which is reseeded at the beginning of each run for reproducibility.
+    """
+    def __init__(self, seed=None, block_size=10000):
+        self.block_size = block_size
+        self.generator = None
+        self.uniforms = []
+        self.i_uniform = 0
+        self.exponentials = []
+        self.i_exponential = 0
+        if seed is None:  # derived from the global NumPy state so that np.random.seed still controls the model
+            seed = np.random.randint(0, 2 ** 31 - 1)
+        self.seed(seed)
+
+    def seed(self, seed):
+        """
+        Reset the streams. Draws made after two calls to seed with the same value are identical.
+        """
+        self.generator = np.random.RandomState(seed)
+        self.uniforms = []
+        self.i_uniform = 0
+        self.exponentials = []
+        self.i_exponential = 0
+
+    def uniform(self, low=0., high=1.):
+        if self.i_uniform == len(self.uniforms):
+            self.uniforms = self.generator.random_sample(self.block_size).tolist()
+            self.i_uniform = 0
+        draw = self.uniforms[self.i_uniform]
+        self.i_uniform += 1
+        return low + (high - low) * draw
+
+    def exponential(self, scale=1.):
+        if self.i_exponential == len(self.exponentials):
+            self.exponentials = self.generator.standard_exponential(self.block_size).tolist()
+            self.i_exponential = 0
+        draw = self.exponentials[self.i_exponential]
+        self.i_exponential += 1
+        return scale * draw
+
+    def bernoulli(self, p):
+        """
+        return: True with probability p
+        """
+        return self.uniform() < p
+
+    def categorical(self, probas):
+        """
+        Draw an index i with probability probas[i]. The probabilities are assumed to sum to one.
+        """
+        draw = self.uniform()
+        cumulated_proba = 0.
+        for index, proba in enumerate(probas):
+            cumulated_proba += proba
+            if draw < cumulated_proba:
+                return index
+        return len(probas) - 1
@@ -0,0 +1,113 @@
+class WeightedSampler(object):
+    """
+    Dictionary-like collection of keys associated with non-negative weights, from which a key can be drawn with a
+    probability proportional to its weight. The weights are stored in a Fenwick (binary indexed) tree so that inserting,
+    deleting or re-weighting a key and drawing a key all cost O(log n).
+    """
+    def __init__(self, items=()):
+        self.slots = {}  # keyed by keys, valued with the positions of the keys in the tree
+        self.keys_by_slot = []  # None for the slots that have been freed
+        self.weights = []
+        self.free_slots = []
+        for key, weight in items:
+            self.slots[key] = len(self.keys_by_slot)
+            self.keys_by_slot.append(key)
+            self.weights.append(float(weight))
+        self.tree = [0.] + self.weights  # 1-based Fenwick tree
+        n = len(self.weights)
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                self.tree[parent] += self.tree[i]
+
+    def add_to_slot(self, slot, delta):
+        i = slot + 1
+        n = len(self.weights)
+        while i <= n:
+            self.tree[i] += delta
+            i += i & -i
+
+    def new_slot(self):
+        if len(self.free_slots) > 0:
+            return self.free_slots.pop()
+        self.keys_by_slot.append(None)
+        self.weights.append(0.)
+        i = len(self.weights)
+        self.tree.append(sum(self.weights[i - (i & -i):i]))  # the new node covers the slots i - lowbit(i) to i - 1
+        return i - 1
+
+    def __setitem__(self, key, weight):
+        if key in self.slots:
+            slot = self.slots[key]
+        else:
+            slot = self.new_slot()
+            self.slots[key] = slot
+            self.keys_by_slot[slot] = key
+        self.add_to_slot(slot, float(weight) - self.weights[slot])
+        self.weights[slot] = float(weight)
+
+    def __getitem__(self, key):
+        return self.weights[self.slots[key]]
+
+    def __delitem__(self, key):
+        slot = self.slots.pop(key)
+        self.add_to_slot(slot, -self.weights[slot])
+        self.weights[slot] = 0.
+        self.keys_by_slot[slot] = None
+        self.free_slots.append(slot)
+
+    def __contains__(self, key):
+        return key in self.slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def keys(self):
+        return self.slots.keys()
+
+    def get_total_weight(self):
+        total = 0.
+        i = len(self.weights)
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def sample(self, uniform_draw):
+        """
+        Draw a key with probability proportional to its weight.
+        uniform_draw: a random number drawn uniformly in [0, 1)
+        """
+        target = uniform_draw * self.get_total_weight()
+        n = len(self.weights)
+        position = 0
+        mask = 1
+        while 2 * mask <= n:
+            mask *= 2
+        while mask > 0:
+            next_position = position + mask
+            if next_position <= n and self.tree[next_position] <= target:
+                position = next_position
+                target -= self.tree[next_position]
+            mask //= 2
+        # rounding errors may lead past the last positive weight
+        slot = min(position, n - 1)
+        while self.weights[slot] == 0. and slot > 0:
+            slot -= 1
+        return self.keys_by_slot[slot]
+
+
+def sample_without_replacement(n, k, uniform_draws):
+    """
+    Draw k distinct integers uniformly in range(n) using Floyd's algorithm. The cost is O(k), whatever the value of n.
+    uniform_draws: a sequence of k random numbers drawn uniformly in [0, 1)
+    return: a list of k integers
+    """
+    selected = set()
+    for i, j in enumerate(range(n - k, n)):
+        t = int(uniform_draws[i] * (j + 1))  # uniform integer in [0, j]
+        if t in selected:
+            selected.add(j)
+        else:
+            selected.add(t)
+    return list(selected)
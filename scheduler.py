@@ -0,0 +1,97 @@
+import heapq
+
+
+class EventHandle(object):
+    """
+    Reference to a single programmed event. Cancelling a handle only flags it (tombstone) so that cancellation costs
+    O(1). The scheduler discards cancelled handles when their date becomes due.
+    """
+    __slots__ = ('event_type', 'date', 'ind_id', 'active')
+
+    def __init__(self, event_type, date, ind_id):
+        self.event_type = event_type
+        self.date = date
+        self.ind_id = ind_id
+        self.active = True  # False once the event has been cancelled or triggered
+
+
+class EventScheduler:
+    """
+    Calendar of the programmed events (deaths, activations, school entries ...).
+    Each event type owns a binary heap of the pending dates and a dictionary of buckets keyed by date and valued with
+    the handles of the events programmed at this date. Scheduling an event costs O(log n) in the number of pending
+    dates, cancelling an event costs O(1) and popping the due events costs O(k) in the number of events returned.
+    """
+    def __init__(self, event_types=()):
+        self.dates = {}  # keyed by event type, valued with heaps of pending dates
+        self.buckets = {}  # keyed by event type, valued with dictionaries {date: [handle1, handle2, ...]}
+        self.n_pending = {}  # keyed by event type, valued with the number of active handles
+        for event_type in event_types:
+            self.add_event_type(event_type)
+
+    def add_event_type(self, event_type):
+        if event_type not in self.buckets:
+            self.dates[event_type] = []
+            self.buckets[event_type] = {}
+            self.n_pending[event_type] = 0
+
+    def schedule(self, event_type, date, ind_id):
+        """
+        Programme an event of type event_type for individual ind_id at time "date"
+        return: the handle of the event, to be used for cancellation
+        """
+        handle = EventHandle(event_type, date, ind_id)
+        buckets = self.buckets[event_type]
+        if date in buckets:
+            buckets[date].append(handle)
+        else:
+            buckets[date] = [handle]
+            heapq.heappush(self.dates[event_type], date)
+        self.n_pending[event_type] += 1
+        return handle
+
+    def schedule_many(self, event_type, dates, ind_ids):
+        """
+        Programme events of type event_type for a batch of individuals. dates and ind_ids are lists of the same length.
+        return: the list of the event handles, in the order of ind_ids
+        """
+        buckets = self.buckets[event_type]
+        heap = self.dates[event_type]
+        handles = []
+        for date, ind_id in zip(dates, ind_ids):
+            handle = EventHandle(event_type, date, ind_id)
+            if date in buckets:
+                buckets[date].append(handle)
+            else:
+                buckets[date] = [handle]
+                heapq.heappush(heap, date)
+            handles.append(handle)
+        self.n_pending[event_type] += len(handles)
+        return handles
+
+    def cancel(self, handle):
+        """
+        Cancel the event associated with handle. Nothing happens if the event has already been triggered or cancelled.
+        """
+        if handle.active:
+            handle.active = False
+            self.n_pending[handle.event_type] -= 1
+
+    def pop_due(self, event_type, time):
+        """
+        Remove all the events of type event_type programmed at or before "time".
+        return: the list of the ids of the individuals concerned, in chronological order of their events
+        """
+        dates = self.dates[event_type]
+        buckets = self.buckets[event_type]
+        due_ind_ids = []
+        while len(dates) > 0 and dates[0] <= time:
+            for handle in buckets.pop(heapq.heappop(dates)):
+                if handle.active:
+                    handle.active = False
+                    due_ind_ids.append(handle.ind_id)
+        self.n_pending[event_type] -= len(due_ind_ids)
+        return due_ind_ids
+
+    def has_pending(self, event_type):
+        return self.n_pending[event_type] > 0
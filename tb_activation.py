@@ -1,11 +1,12 @@
 import numpy as np
 
 
-def generate_an_activation_profile(age, params):
+def generate_an_activation_profile(age, params, random_streams):
     """
     This method generates the outcome of the LTBI episode. Return a time to TB activation (in days. Activation will effectively
     occur if the date of death of the individual is later than the date of activation.
     The method and parameterisation are based on Model 6 from Ragonnet et al 2017.
+    random_streams is the RandomStreams object of the model.
     """
     stages = ['_child', '_teen', '_adult']
     if age < 5.:
@@ -15,36 +16,40 @@ def generate_an_activation_profile(age, params):
     else:
         stage_index = 2
     # high risk or low risk
-    high_risk = np.random.binomial(n=1, p=(1. - params['g' + stages[stage_index]]), size=1)
-    if high_risk == 1:
+    high_risk = random_streams.bernoulli(1. - params['g' + stages[stage_index]])
+    if high_risk:
         # use age-specific epsilon to generate an activation time
-        time_to_activation = np.random.exponential(scale=1./params['epsi' + stages[stage_index]], size=1)
+        time_to_activation = random_streams.exponential(scale=1./params['epsi' + stages[stage_index]])
     else:
         # we use the reactivation rates that vary with age
         if stage_index == 0:
-            time_to_activation = np.random.exponential(scale=1./params['nu' + stages[0]], size=1)
+            time_to_activation = random_streams.exponential(scale=1./params['nu' + stages[0]])
             if time_to_activation/365.25 + age > 5.:  # we use the reactivation rates for the [5-15] age-category
                 time_to_activation = (5. - age)*365.25 +\
-                                     np.random.exponential(scale=1./params['nu' + stages[1]], size=1)
+                                     random_streams.exponential(scale=1./params['nu' + stages[1]])
                 if time_to_activation / 365.25 + age > 15.:  # we use the reactivation rates for the [5-15] age-category
                     time_to_activation = (15. - age) * 365.25 + \
-                                         np.random.exponential(scale=1. / params['nu' + stages[2]], size=1)
+                                         random_streams.exponential(scale=1. / params['nu' + stages[2]])
         elif stage_index == 1:
-            time_to_activation = np.random.exponential(scale=1. / params['nu' + stages[1]], size=1)
+            time_to_activation = random_streams.exponential(scale=1. / params['nu' + stages[1]])
             if time_to_activation / 365.25 + age > 15.:  # we use the reactivation rates for the [5-15] age-category
                 time_to_activation = (15. - age) * 365.25 + \
-                                     np.random.exponential(scale=1. / params['nu' + stages[2]], size=1)
+                                     random_streams.exponential(scale=1. / params['nu' + stages[2]])
         else:
-            time_to_activation = np.random.exponential(scale=1. / params['nu' + stages[2]], size=1)
+            time_to_activation = random_streams.exponential(scale=1. / params['nu' + stages[2]])
 
     return time_to_activation
 
 
 if __name__ == "__main__":
+    import importData
+    import random_streams
+    params = importData.data().common_parameters
     n_active = 0
+    streams = random_streams.RandomStreams(seed=0)
     for _ in range(100000):
         age = np.random.uniform(low=0., high=70.)
-        time_to_act = generate_an_activation_profile(age)
+        time_to_act = generate_an_activation_profile(age, params, streams)
         print "Age: " + str(age) + " / Time in years: " + str(round(time_to_act/365.25))
 
         time_to_live = 365.25*(70 - age)
@@ -75,6 +75,7 @@ for country in country_list:
         print "Running " + scenario + " run " + str(i_run)
         random.seed(i_run)
         m = copy.deepcopy(m_r.m_init[seed_index][scenario])
+        m.random_streams.seed(i_run)
         m.i_seed = seed_index
         m.i_run = i_run
         m.initialised = True
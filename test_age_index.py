@@ -0,0 +1,79 @@
+import unittest
+import numpy as np
+import age_index
+import population
+
+AGE_LIMITS = [(0., 5.), (0., 15.), (15., None), (0., None), (4., 5.), (1., 2.), (0.5, 0.6)] + \
+             [age_index.get_prem_age_limits(cat_index) for cat_index in range(age_index.N_PREM_AGEGROUPS)]
+
+
+class CohortIndexTest(unittest.TestCase):
+    """
+    The individuals found by age range in the cohort index are compared to those found from the individual ages.
+    Run with: python -m unittest test_age_index
+    """
+    def setUp(self):
+        self.random_state = np.random.RandomState(3)
+        self.population_data = population.Population()
+        self.index = age_index.CohortIndex(self.population_data)
+        self.time = 30002.  # first day of cohort 4286, whose last day is 30008
+        for dOB in self.random_state.randint(0, int(self.time), 2000).tolist() + \
+                [self.time + 3. - 1461., self.time + 3. - 365., self.time - 6.]:
+            self.add_individual(dOB)
+
+    def add_individual(self, dOB):
+        ind_id = self.population_data.allocate()
+        self.population_data.dOB[ind_id] = float(dOB)
+        self.index.add(ind_id)
+        return ind_id
+
+    def remove_individual(self, ind_id):
+        self.index.remove(ind_id)
+        self.population_data.release(ind_id)
+
+    def get_expected_ids(self, age_min, age_max, time):
+        ind_ids = self.population_data.alive_ids()
+        ages = self.population_data.get_ages_in_years(ind_ids, time)
+        in_range = ages >= age_min
+        if age_max is not None:
+            in_range &= ages < age_max
+        return set(ind_ids[in_range].tolist())
+
+    def check_index(self, time):
+        for age_min, age_max in AGE_LIMITS:
+            ind_ids = self.index.get_ids(age_min, age_max, time).tolist()
+            self.assertEqual(len(ind_ids), len(set(ind_ids)))
+            self.assertEqual(set(ind_ids), self.get_expected_ids(age_min, age_max, time), (age_min, age_max, time))
+            self.assertEqual(self.index.count(age_min, age_max, time), len(ind_ids), (age_min, age_max, time))
+
+    def test_time_steps_across_cohort_and_year_boundaries(self):
+        # an individual turns 4 (1461 days) and another one turns 1 (365 days) at self.time + 3, and the time moves
+        # to the next cohort at self.time + 7
+        for time in np.arange(self.time, self.time + 10.):
+            self.check_index(time)
+
+    def test_time_steps_over_years(self):
+        for time in np.arange(self.time, self.time + 3. * 365.25, 20.):
+            self.check_index(time)
+
+    def test_births_and_deaths_at_constant_time(self):
+        # the cached frames must follow the changes of the index even when the time does not change
+        self.check_index(self.time)
+        self.add_individual(self.time)
+        self.add_individual(self.time - 1826.)
+        self.check_index(self.time)
+        for ind_id in self.random_state.choice(self.population_data.alive_ids(), 300, replace=False).tolist():
+            self.remove_individual(ind_id)
+        self.check_index(self.time)
+        for dOB in self.random_state.randint(0, int(self.time), 300).tolist():
+            self.add_individual(dOB)  # recycles the released ids
+        self.check_index(self.time)
+
+    def test_index_extended_backwards(self):
+        self.add_individual(-500.)
+        self.check_index(self.time)
+        self.check_index(self.time + 100.)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import membership
+
+
+class IndexedSetTest(unittest.TestCase):
+    """
+    Swap-remove set of individual ids. Run with: python -m unittest test_membership
+    """
+    def setUp(self):
+        self.members = membership.IndexedSet([10, 11, 12, 13, 14])
+
+    def check_positions(self):
+        ids = self.members.ids.tolist()
+        self.assertEqual(len(ids), len(self.members))
+        self.assertEqual(len(self.members.positions), len(ids))
+        for position, ind_id in enumerate(ids):
+            self.assertEqual(self.members.positions[ind_id], position)
+
+    def test_remove_last_member(self):
+        self.members.remove(14)
+        self.assertEqual(self.members.ids.tolist(), [10, 11, 12, 13])
+        self.check_positions()
+
+    def test_remove_middle_member(self):
+        self.members.remove(11)
+        self.assertEqual(self.members.ids.tolist(), [10, 14, 12, 13])
+        self.assertNotIn(11, self.members)
+        self.check_positions()
+
+    def test_remove_all_members(self):
+        for ind_id in [12, 10, 14, 13, 11]:
+            self.members.remove(ind_id)
+            self.check_positions()
+        self.assertEqual(len(self.members), 0)
+        self.assertRaises(KeyError, self.members.remove, 10)
+
+    def test_growth(self):
+        for ind_id in range(100, 200):
+            self.members.add(ind_id)
+        self.members.add(150)
+        self.assertEqual(len(self.members), 105)
+        self.check_positions()
+
+    def test_version(self):
+        version = self.members.version
+        self.members.add(20)
+        self.assertEqual(self.members.version, version + 1)
+        self.members.remove(12)
+        self.assertEqual(self.members.version, version + 2)
+        self.members.discard(20)
+        self.assertEqual(self.members.version, version + 3)
+        # no membership change
+        self.members.add(10)
+        self.members.discard(20)
+        self.assertEqual(self.members.version, version + 3)
+
+
+class OrderedSetTest(unittest.TestCase):
+    """
+    Run with: python -m unittest test_membership
+    """
+    def test_insertion_order(self):
+        members = membership.OrderedSet([3, 1, 2])
+        members.add(1)
+        members.discard(3)
+        members.discard(4)
+        members.add(0)
+        self.assertEqual(list(members), [1, 2, 0])
+        self.assertEqual(members.pop_first(), 1)
+        self.assertEqual(len(members), 2)
+        self.assertNotIn(1, members)
+
+
+class WaitingListTest(unittest.TestCase):
+    """
+    Run with: python -m unittest test_membership
+    """
+    def test_first_in_first_out(self):
+        waiting_list = membership.WaitingList()
+        for ind_id, time in [(5, 0.), (3, 1.), (8, 1.), (1, 2.)]:
+            waiting_list.add(ind_id, time)
+        waiting_list.discard(3)
+        self.assertEqual(waiting_list.pop(), 5)
+        self.assertEqual(waiting_list.peek(), (8, 1.))
+        self.assertEqual(len(waiting_list), 2)
+        self.assertNotIn(3, waiting_list)
+
+    def test_readded_individual(self):
+        # the entry of an individual that left and joined again is the most recent one
+        waiting_list = membership.WaitingList()
+        waiting_list.add(5, 0.)
+        waiting_list.add(6, 1.)
+        waiting_list.discard(5)
+        waiting_list.add(5, 2.)
+        self.assertEqual(waiting_list.pop(), 6)
+        self.assertEqual(waiting_list.pop(), 5)
+        self.assertEqual(len(waiting_list), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+import population
+
+
+class PopulationTest(unittest.TestCase):
+    """
+    Allocation and recycling of individual ids. Run with: python -m unittest test_population
+    """
+    def setUp(self):
+        self.population_data = population.Population(capacity=4)
+        self.ind_ids = [self.population_data.allocate() for _ in range(6)]
+
+    def test_allocation_grows_the_columns(self):
+        self.assertEqual(self.ind_ids, range(6))
+        self.assertTrue(self.population_data.capacity >= 6)
+        self.assertEqual(self.population_data.alive_ids().tolist(), range(6))
+
+    def test_released_ids_are_reused_first_in_first_out(self):
+        for ind_id in [4, 1, 3]:
+            self.population_data.release(ind_id)
+        self.assertEqual(self.population_data.alive_ids().tolist(), [0, 2, 5])
+        self.assertEqual([self.population_data.allocate() for _ in range(4)], [4, 1, 3, 6])
+
+    def test_allocate_many_recycles_first(self):
+        for ind_id in [2, 0]:
+            self.population_data.release(ind_id)
+        ind_ids = self.population_data.allocate_many(5)
+        self.assertEqual(ind_ids.tolist(), [2, 0, 6, 7, 8])
+        self.assertEqual(len(self.population_data.alive_ids()), 9)
+
+    def test_recycled_ids_are_reset(self):
+        self.population_data.ltbi[2] = True
+        self.population_data.programmed['death'][2] = 100.
+        self.population_data.release(2)
+        self.assertEqual(self.population_data.allocate(), 2)
+        self.assertFalse(self.population_data.ltbi[2])
+        self.assertTrue(np.isnan(self.population_data.programmed['death'][2]))
+
+    def test_stale_references(self):
+        references = self.population_data.get_references([1, 2, 3])
+        self.population_data.release(2)
+        self.assertEqual(self.population_data.get_alive_ids(references).tolist(), [1, 3])
+
+        # id 2 now belongs to a new individual, with a new generation
+        self.assertEqual(self.population_data.allocate(), 2)
+        self.assertEqual(self.population_data.generation[2], 1)
+        self.assertEqual(self.population_data.get_alive_ids(references).tolist(), [1, 3])
+        new_references = self.population_data.get_references([2])
+        self.assertEqual(self.population_data.get_alive_ids(new_references).tolist(), [2])
+        self.assertEqual(self.population_data.get_alive_ids([]).tolist(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import numpy as np
+import age_index
+import population
+import sampling
+
+
+class WeightedSamplerTest(unittest.TestCase):
+    """
+    Fenwick-tree sampling of weighted keys. Run with: python -m unittest test_sampling
+    """
+    def setUp(self):
+        self.sampler = sampling.WeightedSampler([('a', 1.), ('b', 2.), ('c', 3.), ('d', 4.)])
+        self.sampler['b'] = 5.
+        self.sampler['c'] = 0.
+        del self.sampler['a']
+        self.sampler['e'] = 2.  # reuses the slot freed by 'a'
+        self.sampler['f'] = 1.  # new slot, extending the tree
+        self.weights = {'b': 5., 'c': 0., 'd': 4., 'e': 2., 'f': 1.}
+
+    def test_total_weight(self):
+        self.assertAlmostEqual(self.sampler.get_total_weight(), sum(self.weights.values()))
+        self.assertEqual(len(self.sampler), 5)
+        self.assertNotIn('a', self.sampler)
+
+    def test_prefix_search(self):
+        # the draws falling in the interval of a key, in slot order, must select this key
+        keys = [key for key in self.sampler.keys_by_slot if key is not None]
+        keys.sort(key=lambda key: self.sampler.slots[key])
+        total = sum(self.weights.values())
+        lower_bound = 0.
+        for key in keys:
+            upper_bound = lower_bound + self.weights[key]
+            if self.weights[key] > 0.:
+                for uniform_draw in np.linspace(lower_bound / total, upper_bound / total, 7)[1:-1]:
+                    self.assertEqual(self.sampler.sample(uniform_draw), key)
+            else:  # keys with a zero weight are never drawn, not even at the boundaries of their empty interval
+                for uniform_draw in [lower_bound / total, np.nextafter(lower_bound / total, 0.)]:
+                    self.assertNotEqual(self.sampler.sample(uniform_draw), key)
+            lower_bound = upper_bound
+        self.assertNotEqual(self.sampler.sample(1. - 1.e-12), 'c')
+
+    def test_frequencies(self):
+        random_state = np.random.RandomState(0)
+        n_draws = 60000
+        draws = [self.sampler.sample(u) for u in random_state.random_sample(n_draws)]
+        total = sum(self.weights.values())
+        for key, weight in self.weights.items():
+            frequency = draws.count(key) / float(n_draws)
+            self.assertAlmostEqual(frequency, weight / total, delta=0.01)
+        self.assertEqual(draws.count('c'), 0)
+
+
+class SampleWithoutReplacementTest(unittest.TestCase):
+    """
+    Floyd's algorithm. Run with: python -m unittest test_sampling
+    """
+    def setUp(self):
+        self.random_state = np.random.RandomState(1)
+
+    def check_sample(self, n, k):
+        sample = sampling.sample_without_replacement(n, k, self.random_state.random_sample(k))
+        self.assertEqual(len(sample), k)
+        self.assertEqual(len(set(sample)), k)
+        self.assertTrue(all(0 <= value < n for value in sample))
+        return sample
+
+    def test_distinct_values_in_range(self):
+        for n in [1, 2, 7, 50, 1000]:
+            for k in [1, n // 3, n // 2, n - 1]:
+                if k > 0:
+                    self.check_sample(n, k)
+
+    def test_whole_range(self):
+        for n in [1, 5, 100]:
+            self.assertEqual(sorted(self.check_sample(n, n)), range(n))
+
+    def test_empty_sample(self):
+        self.assertEqual(self.check_sample(10, 0), [])
+        self.assertEqual(self.check_sample(0, 0), [])
+
+    def test_uniformity(self):
+        counts = np.zeros(10)
+        n_draws = 20000
+        for _ in range(n_draws):
+            counts[self.check_sample(10, 3)] += 1
+        self.assertTrue(np.allclose(counts / n_draws, 0.3, atol=0.015))
+
+
+class SampleIdsTest(unittest.TestCase):
+    """
+    Sampling individuals by age range from the cohort index. Run with: python -m unittest test_sampling
+    """
+    def setUp(self):
+        self.random_state = np.random.RandomState(2)
+        self.population_data = population.Population()
+        self.index = age_index.CohortIndex(self.population_data)
+        self.time = 40000.
+        for dOB in self.random_state.randint(0, 40000, 3000):
+            ind_id = self.population_data.allocate()
+            self.population_data.dOB[ind_id] = float(dOB)
+            self.index.add(ind_id)
+
+    def test_sampled_ids_within_age_bounds(self):
+        for age_min, age_max in [(0., 5.), (0., 15.), (15., None), (0., None), (4., 4.5), (30., 35.), (75., None)]:
+            ids = set(self.index.get_ids(age_min, age_max, self.time).tolist())
+            for n in [1, 10, len(ids) // 2, len(ids)]:
+                sample = self.index.sample_ids(age_min, age_max, self.time, n, self.random_state.random_sample(n))
+                self.assertEqual(len(set(sample.tolist())), n)
+                ages = self.population_data.get_ages_in_years(sample, self.time)
+                self.assertTrue(np.all(ages >= age_min))
+                if age_max is not None:
+                    self.assertTrue(np.all(ages < age_max))
+                self.assertTrue(set(sample.tolist()) <= ids)
+            self.assertIsNone(self.index.sample_ids(age_min, age_max, self.time, len(ids) + 1,
+                                                    self.random_state.random_sample(len(ids) + 1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import agent
+import membership
+import model
+import population
+import scheduler
+
+
+class SchedulingModel(model.Model):
+    """
+    Model reduced to the attributes used by the scheduling methods
+    """
+    def __init__(self):
+        self.population_data = population.Population()
+        self.individuals = {}
+        self.individuals_want_to_move = membership.WaitingList()
+        self.programmed_events = scheduler.EventScheduler(['death', 'activation'])
+
+
+class ScheduleEventTest(unittest.TestCase):
+    """
+    Programmed events of individuals whose ids are recycled. Run with: python -m unittest test_scheduler
+    """
+    def setUp(self):
+        self.m = SchedulingModel()
+
+    def add_individual(self):
+        ind_id = self.m.population_data.allocate()
+        self.m.individuals[ind_id] = agent.Individual(id=ind_id, household_id=0, dOB=0.,
+                                                      population=self.m.population_data)
+        return ind_id
+
+    def remove_individual(self, ind_id):
+        self.m.clean_programmed_dictionaries(ind_id)
+        del self.m.individuals[ind_id]
+        self.m.population_data.release(ind_id)
+
+    def test_rescheduling_cancels_the_previous_event(self):
+        ind_id = self.add_individual()
+        self.m.schedule_event('activation', 10, ind_id)
+        self.m.schedule_event('activation', 20, ind_id)
+        self.assertEqual(self.m.programmed_events.pop_due('activation', 10), [])
+        self.assertEqual(self.m.programmed_events.pop_due('activation', 20), [ind_id])
+
+    def test_rescheduling_for_a_recycled_id(self):
+        ind_id = self.add_individual()
+        self.m.schedule_event('death', 10, ind_id)
+        self.m.schedule_event('activation', 15, ind_id)
+        self.remove_individual(ind_id)
+
+        newborn_id = self.add_individual()
+        self.assertEqual(newborn_id, ind_id)
+        self.m.schedule_event('death', 30, newborn_id)
+        self.m.schedule_event('activation', 40, newborn_id)
+        self.m.schedule_event('activation', 50, newborn_id)
+        self.assertEqual(self.m.programmed_events.pop_due('death', 20), [])
+        self.assertEqual(self.m.programmed_events.pop_due('activation', 45), [])
+        self.assertEqual(self.m.programmed_events.pop_due('death', 30), [newborn_id])
+        self.assertEqual(self.m.programmed_events.pop_due('activation', 50), [newborn_id])
+
+
+if __name__ == "__main__":
+    unittest.main()